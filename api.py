@@ -0,0 +1,361 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, current_app, request, stream_with_context
+
+from bookings import DEFAULT_DURATION, find_conflicts
+from genres import filter_genres, requested_genres
+import ical
+from models import db, Artist, Venue, Show, shows_query, split_shows, streamed
+from matchmaking import match_scopes, recommend
+from pagination import page_size, paginate
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# Columns exposed per resource, the same shapes as Artist/Venue.to_dict
+RESOURCES = {
+    "artists": Artist,
+    "venues": Venue,
+}
+SHOW_COLUMNS = {
+    "id": Show.id,
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name.label("venue_name"),
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name.label("artist_name"),
+    "artist_image_link": Artist.image_link.label("artist_image_link"),
+    "start_time": Show.start_time,
+    "end_time": Show.end_time,
+}
+INCLUDES = ("upcoming_shows", "past_shows")
+CALENDAR_FIELDS = (
+    "id",
+    "start_time",
+    "end_time",
+    "venue_id",
+    "venue_name",
+    "address",
+    "city",
+    "state",
+    "artist_id",
+    "artist_name",
+    "artist_image_link",
+)
+
+
+def dumps(data):
+    """ Returns data serialized as compact JSON bytes """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(
+        data, separators=(",", ":"), default=lambda v: v.isoformat()
+    ).encode("utf-8")
+
+
+def respond(data, status=200):
+    """ Returns data as a JSON response, or 304 if the client has it already """
+    response = current_app.response_class(
+        dumps(data), status=status, mimetype="application/json"
+    )
+    if status == 200:
+        response.add_etag()
+        response.headers["Cache-Control"] = "no-cache"
+        response = response.make_conditional(request)
+    return response
+
+
+def columns_of(model):
+    return {
+        column.name: column
+        for column in model.__table__.columns
+        if column.name != "updated_at"
+    }
+
+
+def requested(name, allowed):
+    """ Returns the comma-separated values of request arg name, checked
+    against allowed, or None if the arg is absent"""
+    value = request.args.get(name)
+    if value is None:
+        return None
+    values = [v.strip() for v in value.split(",") if v.strip()]
+    unknown = [v for v in values if v not in allowed]
+    if unknown:
+        abort(400, "Unknown {}: {}".format(name, ", ".join(unknown)))
+    return values
+
+
+def selected_fields(allowed):
+    """ Returns the sparse fieldset of the request, always including id """
+    fields = requested("fields", allowed) or list(allowed)
+    return ["id"] + [field for field in fields if field != "id"]
+
+
+def page_of(query, keys, fields):
+    page = paginate(query, keys)
+    return {
+        "data": [
+            {field: getattr(row, field) for field in fields} for row in page.items
+        ],
+        "next": page.next_cursor,
+        "prev": page.prev_cursor,
+    }
+
+
+# By status code, as the app's own 404 and 500 handlers render HTML
+@api.errorhandler(400)
+@api.errorhandler(404)
+def http_error(error):
+    return respond({"error": error.description}, error.code)
+
+
+# A method no route allows fails before any blueprint matches, so only the
+# app's handlers see it
+@api.app_errorhandler(405)
+def method_not_allowed(error):
+    if not request.path.startswith(api.url_prefix + "/"):
+        return error
+    response = http_error(error)
+    response.headers["Allow"] = ", ".join(error.valid_methods)
+    return response
+
+
+@api.route("/<any(artists, venues):resource>")
+def list_resource(resource):
+    model = RESOURCES[resource]
+    columns = columns_of(model)
+    fields = selected_fields(columns)
+    query = db.session.query(*[columns[field] for field in fields])
+    query = filter_genres(query, model.genres, requested_genres())
+    return respond(page_of(query, [model.id], fields))
+
+
+@api.route("/<any(artists, venues):resource>/<int:id>")
+def get_resource(resource, id):
+    model = RESOURCES[resource]
+    columns = columns_of(model)
+    fields = selected_fields(columns)
+    includes = requested("include", INCLUDES) or []
+    row = (
+        db.session.query(*[columns[field] for field in fields])
+        .filter(model.id == id)
+        .one_or_none()
+    )
+    if row is None:
+        abort(404, "No {} with id {}".format(resource[:-1], id))
+
+    data = {field: getattr(row, field) for field in fields}
+    if includes:
+        now = datetime.today()
+        if model is Venue:
+            shows = split_shows(Show.venue_id == id, Artist, Show.artist_id, now)
+        else:
+            shows = split_shows(Show.artist_id == id, Venue, Show.venue_id, now)
+        for include in includes:
+            data[include] = shows[include]
+            data[include + "_count"] = shows[include + "_count"]
+    return respond(data)
+
+
+@api.route("/<any(artists, venues):resource>/<int:id>/matches")
+def get_matches(resource, id):
+    """ Returns the artists seeking venues that best match a venue, or the
+    venues seeking talent that best match an artist"""
+    model = RESOURCES[resource]
+    entity = (
+        db.session.query(model.id, model.city, model.state, model.genres)
+        .filter(model.id == id)
+        .one_or_none()
+    )
+    if entity is None:
+        abort(404, "No {} with id {}".format(resource[:-1], id))
+
+    limit = page_size()
+    # Cached until the entity or one of its shows changes, or a counterpart
+    # in its city or sharing one of its genres does
+    counterpart = Artist if model is Venue else Venue
+    scopes = ["{}:{}".format(resource[:-1], id)] + match_scopes(
+        counterpart, entity.state, entity.city, entity.genres
+    )
+    matches = current_app.extensions["page_cache"].memoize(
+        "matches:{}:{}:{}".format(resource, id, limit),
+        scopes,
+        lambda: recommend(
+            resource, entity, limit, current_app.config["MATCH_CANDIDATES"]
+        ),
+    )
+    return respond({"data": matches})
+
+
+def show_query(fields, genres=()):
+    """ Returns a query of the show fields, narrowed to artists of any of
+    genres, joining only the tables they need"""
+    columns = [SHOW_COLUMNS[field] for field in fields]
+    query = db.session.query(*columns).select_from(Show)
+    if genres or any(f.startswith("artist_") and f != "artist_id" for f in fields):
+        query = query.join(Artist, Show.artist_id == Artist.id)
+        query = filter_genres(query, Artist.genres, genres)
+    if "venue_name" in fields:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    return query
+
+
+@api.route("/shows")
+def list_shows():
+    fields = selected_fields(SHOW_COLUMNS)
+    # the keyset needs start_time on every row, even when it is not returned
+    keyed = fields if "start_time" in fields else fields + ["start_time"]
+    query = show_query(keyed, requested_genres())
+    return respond(page_of(query, [Show.start_time, Show.id], fields))
+
+
+@api.route("/shows/<int:id>")
+def get_show(id):
+    fields = selected_fields(SHOW_COLUMNS)
+    row = show_query(fields).filter(Show.id == id).one_or_none()
+    if row is None:
+        abort(404, "No show with id {}".format(id))
+    return respond({field: getattr(row, field) for field in fields})
+
+
+def parse_slot(number, slot):
+    """ Returns a candidate slot of the availability check with its values
+    parsed, aborting if it is malformed"""
+    try:
+        start = datetime.fromisoformat(slot["start_time"])
+        if slot.get("end_time"):
+            end = datetime.fromisoformat(slot["end_time"])
+        else:
+            end = start + DEFAULT_DURATION
+        ids = {
+            key: int(slot[key])
+            for key in ("venue_id", "artist_id")
+            if slot.get(key) is not None
+        }
+    except (KeyError, TypeError, ValueError):
+        abort(400, "Slot {} needs an ISO start_time and integer ids".format(number))
+    if not ids or end <= start:
+        abort(
+            400,
+            "Slot {} needs a venue_id or artist_id and to end after it starts".format(
+                number
+            ),
+        )
+    return dict(ids, start_time=start, end_time=end)
+
+
+@api.route("/shows/availability", methods=["POST"])
+def check_availability():
+    """ Returns, for each candidate slot posted as {"slots": [...]}, whether
+    its venue and artist are free and the shows in the way if not"""
+    slots = (request.get_json(silent=True) or {}).get("slots")
+    if not isinstance(slots, list) or not slots:
+        abort(400, "Expected a list of slots")
+    if len(slots) > current_app.config["MAX_AVAILABILITY_SLOTS"]:
+        abort(
+            400,
+            "At most {} slots per request".format(
+                current_app.config["MAX_AVAILABILITY_SLOTS"]
+            ),
+        )
+    slots = [parse_slot(number, slot) for number, slot in enumerate(slots)]
+    conflicts = find_conflicts(db.session, Show, slots)
+    return respond(
+        {
+            "data": [
+                {
+                    "available": not venue_conflicts and not artist_conflicts,
+                    "venue_conflicts": venue_conflicts,
+                    "artist_conflicts": artist_conflicts,
+                }
+                for venue_conflicts, artist_conflicts in conflicts
+            ]
+        }
+    )
+
+
+def requested_time(name, default):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, "{} must be an ISO date or date and time".format(name))
+
+
+def requested_ids(name):
+    try:
+        return [int(value) for value in request.args.getlist(name)]
+    except ValueError:
+        abort(400, "{} must be integers".format(name))
+
+
+def stream_data(rows, fields, chunk_size=500):
+    """ Yields {"data": [...]} as JSON bytes, a chunk of rows at a time """
+    chunk = [b'{"data":[']
+    for count, row in enumerate(rows):
+        if count:
+            chunk.append(b",")
+        chunk.append(dumps({field: getattr(row, field) for field in fields}))
+        if count % chunk_size == chunk_size - 1:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(b"]}")
+    yield b"".join(chunk)
+
+
+@api.route("/calendar")
+def calendar():
+    """ Streams the shows starting in a time window, as JSON or iCalendar
+
+    The window is [from, to), by default the next seven days. It can be
+    narrowed by city and state, by any number of venue_id and artist_id,
+    and by genre. Shows come in start time order, read from a range scan of
+    the start_time (or venue and start_time) index a batch at a time.
+    """
+    start = requested_time("from", datetime.today())
+    end = requested_time("to", start + timedelta(days=7))
+    max_days = current_app.config["CALENDAR_MAX_DAYS"]
+    if not start < end <= start + timedelta(days=max_days):
+        abort(400, "to must be after from, by at most {} days".format(max_days))
+    fmt = request.args.get("format", "json")
+    if fmt not in ("json", "ics"):
+        abort(400, "format must be json or ics")
+
+    query = shows_query().add_columns(
+        Show.end_time, Venue.address, Venue.city, Venue.state
+    )
+    query = query.filter(Show.start_time >= start, Show.start_time < end)
+    for column in (Venue.city, Venue.state):
+        value = request.args.get(column.key)
+        if value:
+            query = query.filter(column == value)
+    venue_ids = requested_ids("venue_id")
+    if venue_ids:
+        query = query.filter(Show.venue_id.in_(venue_ids))
+    artist_ids = requested_ids("artist_id")
+    if artist_ids:
+        query = query.filter(Show.artist_id.in_(artist_ids))
+    query = filter_genres(query, Artist.genres, requested_genres())
+    rows = streamed(
+        query.order_by(Show.start_time, Show.id).yield_per(
+            current_app.config["CALENDAR_BATCH_SIZE"]
+        )
+    )
+
+    if fmt == "ics":
+        response = current_app.response_class(
+            stream_with_context(ical.serialize(rows)), mimetype="text/calendar"
+        )
+        response.headers["Content-Disposition"] = 'inline; filename="shows.ics"'
+        return response
+    return current_app.response_class(
+        stream_with_context(stream_data(rows, CALENDAR_FIELDS)),
+        mimetype="application/json",
+    )
@@ -2,28 +2,69 @@
 # Imports
 # ----------------------------------------------------------------------------#
 
+import hmac
+import io
 import json
+import os
+import click
+import functools
 import dateutil.parser
+from datetime import datetime, timedelta
+from itertools import groupby
 import babel
+import babel.dates
 from flask import (
     Flask,
+    stream_with_context,
     render_template,
     request,
     Response,
     flash,
+    send_from_directory,
     redirect,
     url_for,
     abort,
 )
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import ARRAY
-import logging
-from logging import Formatter, FileHandler
+import config
 from flask_wtf import FlaskForm
 from forms import *
+from pagination import paginate
+import search
+import bookings
+import stats
+from genres import filter_genres, genre_counts, genre_facets, requested_genres
+from matchmaking import match_scopes
+from models import (
+    db,
+    Venue,
+    Artist,
+    Show,
+    ArtistStats,
+    VenueStats,
+    PendingDelete,
+    VENUE_AREA_KEYS,
+    delete_shows,
+    shows_query,
+    show_row_dict,
+    split_shows,
+    streamed,
+)
+from cache import PageCache
+import assets
+from metrics import RequestMetrics
+from profiler import Profiler
+import sessions
+import routing
+import logs
+from importer import Importer, guess_format
+import exporter
+from api import api
 from flask_migrate import Migrate
-import sys
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+import threading
+import time
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -31,137 +72,44 @@ import sys
 
 app = Flask(__name__)
 moment = Moment(app)
-app.config.from_object("config")
-db = SQLAlchemy(app)
+app.config.from_object(config)
+app.config.from_object(config.PROFILES[os.environ.get("FAYIR_CONFIG", "development")])
+app.config.from_prefixed_env("FAYIR")
+if not app.secret_key:
+    raise RuntimeError("No secret key: set SECRET_KEY or SECRET_KEY_FILE")
+logs.init_app(app)
+db.init_app(app)
 migrate = Migrate(app, db)
+request_metrics = RequestMetrics(app)
+profiler = Profiler(app)
+static_assets = assets.Assets(app)
+page_cache = PageCache(app)
+sessions.init_app(app)
+routing.init_app(app)
+app.register_blueprint(api)
 
 # ----------------------------------------------------------------------------#
-# Models.
+# Filters.
 # ----------------------------------------------------------------------------#
 
-# shows = db.Table(
-#     "Show",
-#     db.Column("artist_id", db.Integer, db.ForeignKey("Artist.id"), primary_key=True),
-#     db.Column("venue_id", db.Integer, db.ForeignKey("Venue.id"), primary_key=True),
-#     db.Column("start_time", db.DateTime),
-# )
-
-
-class Venue(db.Model):
-    __tablename__ = "Venue"
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    address = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(ARRAY(db.String(30)))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(500))
-    seeking_talent = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
-
-    shows = db.relationship("Show", cascade="all, delete-orphan", backref="venues",)
-
-    def to_dict(self):
-        """ Returns a dictinary of vevenuesnues """
-        return {
-            "id": self.id,
-            "name": self.name,
-            "city": self.city,
-            "state": self.state,
-            "address": self.address,
-            "phone": self.phone,
-            "genres": self.genres,
-            "image_link": self.image_link,
-            "facebook_link": self.facebook_link,
-            "website": self.website,
-            "seeking_talent": self.seeking_talent,
-            "seeking_description": self.seeking_description,
-        }
-
-    def __repr__(self):
-        return f"<Venue {self.id} {self.name}>"
-
-
-class Artist(db.Model):
-    __tablename__ = "Artist"
-
-    id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
-    phone = db.Column(db.String(120))
-    genres = db.Column(ARRAY(db.String(30)))
-    image_link = db.Column(db.String(500))
-    facebook_link = db.Column(db.String(120))
-    website = db.Column(db.String(500))
-    seeking_venue = db.Column(db.Boolean)
-    seeking_description = db.Column(db.String())
-
-    shows = db.relationship("Show", cascade="all, delete-orphan", backref="artists")
-
-    def to_dict(self):
-        """ Returns a dictinary of vevenuesnues """
-        return {
-            "id": self.id,
-            "name": self.name,
-            "city": self.city,
-            "state": self.state,
-            "phone": self.phone,
-            "genres": self.genres,
-            "image_link": self.image_link,
-            "facebook_link": self.facebook_link,
-            "website": self.website,
-            "seeking_venue": self.seeking_venue,
-            "seeking_description": self.seeking_description,
-        }
-
-
-class Show(db.Model):
-    __tablename__ = "Show"
-
-    id = db.Column(db.Integer, primary_key=True)
-    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id",))
-    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id"))
-    start_time = db.Column(db.DateTime, nullable=False)
-
-    venue = db.relationship("Venue")
-    artist = db.relationship("Artist")
-
-    def show_artist(self):
-        """ Returns a dictinary of artists for the show """
-        return {
-            "artist_id": self.artist_id,
-            "artist_name": self.artist.name,
-            "artist_image_link": self.artist.image_link,
-            "start_time": self.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
-
-    def show_venue(self):
-        """ Returns a dictinary of venues for the show """
-        return {
-            "venue_id": self.venue_id,
-            "venue_name": self.venue.name,
-            "venue_image_link": self.venue.image_link,
-            "start_time": self.start_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
 
+DATETIME_FORMATS = {
+    "full": "EEEE | d MMMM y | HH:MM",
+    "medium": "EE MM, dd, y HH:MM",
+}
+DATETIME_LOCALE = babel.Locale.parse(babel.dates.LC_TIME)
 
-# ----------------------------------------------------------------------------#
-# Filters.
-# ----------------------------------------------------------------------------#
+
+@functools.lru_cache(maxsize=None)
+def datetime_pattern(format):
+    """ Returns the compiled Babel pattern of a format name or pattern """
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
 
 
 def format_datetime(value, format="medium"):
-    date = dateutil.parser.parse(value)
-    if format == "full":
-        format = "EEEE | d MMMM y | HH:MM"
-    elif format == "medium":
-        format = "EE MM, dd, y HH:MM"
-    return babel.dates.format_datetime(date, format)
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    return datetime_pattern(format).apply(value, DATETIME_LOCALE)
 
 
 app.jinja_env.filters["datetime"] = format_datetime
@@ -176,68 +124,354 @@ def index():
     return render_template("pages/home.html")
 
 
+#  Page cache
+#  ----------------------------------------------------------------
+
+
+def venue_scopes(venue_id):
+    """ Returns the cached page scopes showing the venue """
+    artist_ids = (
+        db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()
+    )
+    return (
+        ["venues", "shows", "venue:{}".format(venue_id)]
+        + ["artist:{}".format(artist_id) for (artist_id,) in artist_ids]
+        + entity_match_scopes(Venue, venue_id)
+    )
+
+
+def artist_scopes(artist_id):
+    """ Returns the cached page scopes showing the artist """
+    venue_ids = (
+        db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()
+    )
+    return (
+        ["artists", "shows", "artist:{}".format(artist_id)]
+        + ["venue:{}".format(venue_id) for (venue_id,) in venue_ids]
+        + entity_match_scopes(Artist, artist_id)
+    )
+
+
+def entity_match_scopes(model, id):
+    """ Returns the scopes of the matches the venue or artist can be in """
+    entity = db.session.get(model, id)
+    if entity is None:
+        return []
+    return match_scopes(model, entity.state, entity.city, entity.genres)
+
+
+def imported_scopes(model, values):
+    """ Returns the scopes of the pages listing the imported venues or artists,
+    and of the matches they can be in"""
+    scopes = {
+        scope
+        for row in values
+        for scope in match_scopes(
+            model, row.get("state"), row.get("city"), row.get("genres")
+        )
+    }
+    return ["venues" if model is Venue else "artists", *scopes]
+
+
+def cached_facets(key, scope, query, column, genres):
+    """ Returns the genre facets of query, counted once per generation of
+    scope rather than on every page: the counts cover every row of query,
+    whatever the page or genre selection"""
+    counts = page_cache.memoize(
+        "facets:{}".format(key), [scope], lambda: genre_counts(query, column)
+    )
+    return genre_facets(counts, genres)
+
+
+def require_metrics_token():
+    """ Aborts unless the request bears METRICS_TOKEN, or metrics are public
+    and no token is set"""
+    token = app.config.get("METRICS_TOKEN")
+    if token or not app.config["METRICS_PUBLIC"]:
+        authorization = request.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(authorization, "Bearer " + token):
+            abort(401)
+
+
+@app.route("/cache/stats")
+def cache_stats():
+    require_metrics_token()
+    return page_cache.stats()
+
+
+@app.route("/metrics")
+def metrics():
+    require_metrics_token()
+    return Response(request_metrics.exposition(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/profiles")
+def profiles():
+    if not profiler.directory:
+        abort(404)
+    if not profiler.authorized():
+        abort(401)
+    return render_template(
+        "pages/profiles.html",
+        profiles=profiler.recent(),
+        token=profiler.request_token(),
+    )
+
+
+@app.route("/profiles/<name>")
+def profile_file(name):
+    if not profiler.directory:
+        abort(404)
+    if not profiler.authorized():
+        abort(401)
+    return send_from_directory(profiler.directory, name, mimetype="text/plain")
+
+
+@app.cli.group("assets")
+def assets_command():
+    """ Builds the static files. """
+
+
+@assets_command.command("build")
+def assets_build_command():
+    """ Bundles, fingerprints and compresses the static files. """
+    manifest = assets.build(app.static_folder)
+    click.echo("Built {} static files".format(len(manifest)))
+
+
+@app.cli.command("profile-token")
+def profile_token():
+    """ Prints a token profiling the requests carrying it. """
+    click.echo(profiler.token())
+
+
+#  Deletes
+#  ----------------------------------------------------------------
+
+DELETE_COLUMNS = {"venues": (Venue, Show.venue_id), "artists": (Artist, Show.artist_id)}
+
+
+def delete_in_batches(kind, id, scopes, batch_size):
+    """ Deletes the shows of a venue or artist a batch at a time, then itself
+    and its pending delete
+
+    Returns the number of shows deleted.
+    """
+    model, column = DELETE_COLUMNS[kind]
+    with app.app_context():
+        other, other_ids = stats.counterparts(db.session, kind, id)
+        deleted = delete_shows(column == id, batch_size)
+        db.session.query(model).filter(model.id == id).delete()
+        db.session.query(PendingDelete).filter_by(kind=kind, entity_id=id).delete()
+        stats.refresh(db.session, other, other_ids)
+        db.session.commit()
+    page_cache.invalidate(*scopes)
+    return deleted
+
+
+def delete_entity(kind, entity, scopes):
+    """ Deletes a venue or artist and returns the DELETE response
+
+    The shows go with it in the same statement through ON DELETE CASCADE,
+    unless there are more than DELETE_BATCH_THRESHOLD of them: then they are
+    deleted in batches in the background and the response is 202 Accepted.
+    The delete is recorded as pending first, for `flask delete --pending` to
+    finish should the process stop before it is done.
+    """
+    model, column = DELETE_COLUMNS[kind]
+    count = db.session.query(db.func.count(Show.id)).filter(column == entity.id)
+    if count.scalar() > app.config["DELETE_BATCH_THRESHOLD"]:
+        if db.session.get(PendingDelete, (kind, entity.id)) is None:
+            db.session.add(PendingDelete(kind=kind, entity_id=entity.id))
+            db.session.commit()
+        threading.Thread(
+            target=delete_in_batches,
+            args=(kind, entity.id, scopes, app.config["DELETE_BATCH_SIZE"]),
+            daemon=True,
+        ).start()
+        return {"success": True, "pending": True}, 202
+
+    other, other_ids = stats.counterparts(db.session, kind, entity.id)
+    db.session.delete(entity)
+    db.session.flush()
+    stats.refresh(db.session, other, other_ids)
+    db.session.commit()
+    page_cache.invalidate(*scopes)
+    return {"success": True}
+
+
+def entity_scopes(kind, id):
+    return venue_scopes(id) if kind == "venues" else artist_scopes(id)
+
+
+@app.cli.command("delete")
+@click.argument("kind", type=click.Choice(sorted(DELETE_COLUMNS)), required=False)
+@click.argument("id", type=int, required=False)
+@click.option("--batch-size", type=int, help="Shows deleted per transaction.")
+@click.option("--pending", is_flag=True, help="Finish the deletes left pending.")
+def delete_command(kind, id, batch_size, pending):
+    """ Deletes a venue or artist with many shows, in batches """
+    batch_size = batch_size or app.config["DELETE_BATCH_SIZE"]
+    if pending:
+        jobs = db.session.query(PendingDelete.kind, PendingDelete.entity_id).all()
+        db.session.rollback()
+        for kind, id in jobs:
+            deleted = delete_in_batches(kind, id, entity_scopes(kind, id), batch_size)
+            click.echo("Deleted {} {} and its {} shows".format(kind[:-1], id, deleted))
+        return
+    if kind is None or id is None:
+        raise click.UsageError("Give KIND and ID, or --pending")
+    model, _ = DELETE_COLUMNS[kind]
+    if db.session.get(model, id) is None:
+        raise click.ClickException("No {} with id {}".format(kind[:-1], id))
+    deleted = delete_in_batches(kind, id, entity_scopes(kind, id), batch_size)
+    click.echo("Deleted {} {} and its {} shows".format(kind[:-1], id, deleted))
+
+
+#  Show statistics
+#  ----------------------------------------------------------------
+
+
+@app.cli.group("stats")
+def stats_command():
+    """ Maintains the show counts and times of venues and artists. """
+
+
+@stats_command.command("roll")
+@click.option("--every", type=int, help="Keep rolling, every this many seconds.")
+def stats_roll_command(every):
+    """ Moves the shows that started since the last roll from upcoming to past """
+    while True:
+        rolled = stats.roll(db.session)
+        db.session.commit()
+        page_cache.invalidate(
+            "venues",
+            "artists",
+            *["venue:{}".format(id) for id in rolled["venues"]],
+            *["artist:{}".format(id) for id in rolled["artists"]]
+        )
+        click.echo(
+            "Rolled {} venues and {} artists".format(
+                len(rolled["venues"]), len(rolled["artists"])
+            )
+        )
+        if not every:
+            return
+        time.sleep(every)
+
+
+@stats_command.command("rebuild")
+def stats_rebuild_command():
+    """ Recomputes the statistics of every venue and artist from the shows """
+    stats.rebuild(db.session)
+    db.session.commit()
+    page_cache.invalidate("venues", "artists")
+    click.echo("Rebuilt show statistics")
+
+
 #  Venues
 #  ----------------------------------------------------------------
 
 
 @app.route("/venues")
+@page_cache.cached("venues")
 def venues():
-    data = [venue.to_dict() for venue in Venue.query.all()]
-    city_states = (
-        db.session.query(Venue.city, Venue.state)
-        .group_by(Venue.city, Venue.state)
-        .all()
+    genres = requested_genres()
+    rows = (
+        db.session.query(
+            Venue.id,
+            Venue.name,
+            Venue.city,
+            Venue.state,
+            db.func.coalesce(VenueStats.upcoming_shows_count, 0).label(
+                "num_upcoming_shows"
+            ),
+            *VENUE_AREA_KEYS[:-1],
+        )
+        .outerjoin(VenueStats)
     )
+    rows = filter_genres(rows, Venue.genres, genres)
+    page = paginate(rows, VENUE_AREA_KEYS)
 
     venues_data = list()
-    for c in city_states:
-        venue_dict = {}
-        venue_dict["city"], venue_dict["state"] = c[0], c[1]
-        venue_dict["venues"] = [
-            {"id": v.id, "name": v.name, "num_upcoming_shows": 0}
-            for v in Venue.query.filter_by(city=venue_dict["city"]).all()
-        ]
-        venues_data.append(venue_dict)
+    for (city, state), area in groupby(page.items, key=lambda r: (r.city, r.state)):
+        venues_data.append(
+            {
+                "city": city,
+                "state": state,
+                "venues": [
+                    {
+                        "id": v.id,
+                        "name": v.name,
+                        "num_upcoming_shows": v.num_upcoming_shows,
+                    }
+                    for v in area
+                ],
+            }
+        )
 
-    return render_template("pages/venues.html", areas=venues_data)
+    return render_template(
+        "pages/venues.html",
+        areas=venues_data,
+        page=page,
+        genres=genres,
+        facets=cached_facets(
+            "venues", "venues", db.session.query(Venue.id), Venue.genres, genres
+        ),
+    )
 
 
-@app.route("/venues/search", methods=["POST"])
+@app.route("/venues/search", methods=["GET", "POST"])
 def search_venues():
-    search_term = request.form.get("search_term", "")
-    search_result = Venue.query.filter(
-        Venue.name.ilike("%{}%".format(search_term))
-    ).all()
+    search_term = request.values.get("search_term", "")
+    genres = requested_genres()
+    upcoming = db.func.coalesce(VenueStats.upcoming_shows_count, 0)
+    search_result, rank = search.search_names(
+        db.session.query(Venue.id, Venue.name, upcoming.label("num_upcoming_shows"))
+        .outerjoin(VenueStats),
+        Venue,
+        search_term,
+    )
+    facets = cached_facets(
+        "venues:" + search_term, "venues", search_result, Venue.genres, genres
+    )
+    search_result = filter_genres(search_result, Venue.genres, genres)
+    page = paginate(search_result, [rank, Venue.id])
     response = {
-        "count": len(search_result),
+        "count": search_result.count(),
         "data": [
-            {"id": v.id, "name": v.name, "num_upcoming_shows": 0,}
-            for v in search_result
+            {"id": v.id, "name": v.name, "num_upcoming_shows": v.num_upcoming_shows}
+            for v in page.items
         ],
     }
     return render_template(
-        "pages/search_venues.html", results=response, search_term=search_term,
+        "pages/search_venues.html",
+        results=response,
+        search_term=search_term,
+        page=page,
+        genres=genres,
+        facets=facets,
     )
 
 
 @app.route("/venues/<int:venue_id>")
+@page_cache.cached("venue:{venue_id}")
 def show_venue(venue_id):
-    venue = Venue.query.get(venue_id)
+    venue = db.session.get(Venue, venue_id, options=[joinedload(Venue.stats)])
+    if venue is None:
+        abort(404)
+    now = datetime.today()
     venue_dict = venue.to_dict()
-
-    past_shows = list(filter(lambda x: x.start_time < datetime.today(), venue.shows,))
-    upcoming_shows = list(
-        filter(lambda x: x.start_time >= datetime.today(), venue.shows,)
+    venue_dict.update(
+        split_shows(
+            Show.venue_id == venue_id,
+            Artist,
+            Show.artist_id,
+            now,
+            counts=venue.stats.counts(now) if venue.stats else None,
+        )
     )
 
-    past_shows = list(map(lambda x: x.show_artist(), past_shows))
-    upcoming_shows = list(map(lambda x: x.show_artist(), upcoming_shows))
-
-    venue_dict["past_shows"] = past_shows
-    venue_dict["upcoming_shows"] = upcoming_shows
-    venue_dict["past_shows_count"] = len(past_shows)
-    venue_dict["upcoming_shows_count"] = len(upcoming_shows)
-
     return render_template("pages/show_venue.html", venue=venue_dict)
 
 
@@ -265,19 +499,21 @@ def create_venue_submission():
         venue.facebook_link = request.form["facebook_link"]
         venue.website = request.form["website"]
         venue.image_link = request.form["image_link"]
-        venue.seeking_venue = (
+        venue.seeking_talent = (
             True
             if "seeking_talent" in request.form
             and request.form["seeking_talent"] == "y"
             else False
         )
         venue.seeking_description = request.form["seeking_description"]
+        scopes = match_scopes(Venue, venue.state, venue.city, venue.genres)
         db.session.add(venue)
         db.session.commit()
-    except:
+        page_cache.invalidate("venues", *scopes)
+    except Exception:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception("Could not create venue")
     finally:
         db.session.close()
         if error:
@@ -300,8 +536,8 @@ def edit_venue(venue_id):
     if venue is None:
         abort(404)
 
+    # Without the empty GET form data, which unticks every checkbox
     form = VenueForm(
-        request.form,
         name=venue.name,
         city=venue.city,
         state=venue.state,
@@ -309,7 +545,7 @@ def edit_venue(venue_id):
         facebook_link=venue.facebook_link,
         genres=venue.genres,
         website=venue.website,
-        seeking_venue=venue.seeking_talent,
+        seeking_talent=venue.seeking_talent,
         seeking_description=venue.seeking_description,
         image_link=venue.image_link,
         address=venue.address,
@@ -323,6 +559,8 @@ def edit_venue_submission(venue_id):
     error = False
     try:
         venue = Venue.query.get(venue_id)
+        # The matches the venue was in before the edit
+        scopes = match_scopes(Venue, venue.state, venue.city, venue.genres)
         venue.name = request.form["name"]
         venue.city = request.form["city"]
         venue.state = request.form["state"]
@@ -340,10 +578,11 @@ def edit_venue_submission(venue_id):
         )
         venue.seeking_description = request.form["seeking_description"]
         db.session.commit()
-    except:
+        page_cache.invalidate(*venue_scopes(venue_id), *scopes)
+    except Exception:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception("Could not update venue %s", venue_id)
     finally:
         db.session.close()
         if error:
@@ -365,54 +604,79 @@ def delete_venue(venue_id):
     venue = Venue.query.filter_by(id=venue_id).one_or_none()
     if venue is None:
         abort(404)
-    db.session.delete(venue)
-    db.session.commit()
-
-    return None
+    return delete_entity("venues", venue, venue_scopes(venue.id))
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route("/artists")
+@page_cache.cached("artists")
 def artists():
-    artists = Artist.query.order_by(Artist.id).all()
-    return render_template("pages/artists.html", artists=artists)
+    genres = requested_genres()
+    query = db.session.query(Artist.id, Artist.name)
+    facets = cached_facets("artists", "artists", query, Artist.genres, genres)
+    page = paginate(filter_genres(query, Artist.genres, genres), [Artist.id])
+    return render_template(
+        "pages/artists.html",
+        artists=page.items,
+        page=page,
+        genres=genres,
+        facets=facets,
+    )
 
 
-@app.route("/artists/search", methods=["POST"])
+@app.route("/artists/search", methods=["GET", "POST"])
 def search_artists():
-    search_term = request.form.get("search_term", "")
-    artists = Artist.query.filter(Artist.name.ilike("%{}%".format(search_term))).all()
-    data = [{"id": a.id, "name": a.name, "num_upcoming_shows": 0} for a in artists]
+    search_term = request.values.get("search_term", "")
+    genres = requested_genres()
+    upcoming = db.func.coalesce(ArtistStats.upcoming_shows_count, 0)
+    artists, rank = search.search_names(
+        db.session.query(Artist.id, Artist.name, upcoming.label("num_upcoming_shows"))
+        .outerjoin(ArtistStats),
+        Artist,
+        search_term,
+    )
+    facets = cached_facets(
+        "artists:" + search_term, "artists", artists, Artist.genres, genres
+    )
+    artists = filter_genres(artists, Artist.genres, genres)
+    page = paginate(artists, [rank, Artist.id])
+    data = [
+        {"id": a.id, "name": a.name, "num_upcoming_shows": a.num_upcoming_shows}
+        for a in page.items
+    ]
 
     response = {
-        "count": len(artists),
+        "count": artists.count(),
         "data": data,
     }
     return render_template(
-        "pages/search_artists.html", results=response, search_term=search_term,
+        "pages/search_artists.html",
+        results=response,
+        search_term=search_term,
+        page=page,
+        genres=genres,
+        facets=facets,
     )
 
 
 @app.route("/artists/<int:artist_id>")
+@page_cache.cached("artist:{artist_id}")
 def show_artist(artist_id):
-    artist = Artist.query.filter_by(id=artist_id).one_or_none()
+    artist = db.session.get(Artist, artist_id, options=[joinedload(Artist.stats)])
     if artist is None:
         abort(404)
+    now = datetime.today()
     artist_dict = artist.to_dict()
-
-    past_shows = list(filter(lambda x: x.start_time < datetime.today(), artist.shows,))
-    upcoming_shows = list(
-        filter(lambda x: x.start_time >= datetime.today(), artist.shows,)
+    artist_dict.update(
+        split_shows(
+            Show.artist_id == artist_id,
+            Venue,
+            Show.venue_id,
+            now,
+            counts=artist.stats.counts(now) if artist.stats else None,
+        )
     )
-
-    past_shows = list(map(lambda x: x.show_venue(), past_shows))
-    upcoming_shows = list(map(lambda x: x.show_venue(), upcoming_shows))
-
-    artist_dict["past_shows"] = past_shows
-    artist_dict["upcoming_shows"] = upcoming_shows
-    artist_dict["past_shows_count"] = len(past_shows)
-    artist_dict["upcoming_shows_count"] = len(upcoming_shows)
     return render_template("pages/show_artist.html", artist=artist_dict)
 
 
@@ -425,8 +689,8 @@ def edit_artist(artist_id):
     if artist is None:
         abort(404)
 
+    # Without the empty GET form data, which unticks every checkbox
     form = ArtistForm(
-        request.form,
         name=artist.name,
         city=artist.city,
         state=artist.state,
@@ -447,6 +711,8 @@ def edit_artist_submission(artist_id):
     error = False
     try:
         artist = Artist.query.get(artist_id)
+        # The matches the artist was in before the edit
+        scopes = match_scopes(Artist, artist.state, artist.city, artist.genres)
         artist.name = request.form["name"]
         artist.city = request.form["city"]
         artist.state = request.form["state"]
@@ -462,10 +728,11 @@ def edit_artist_submission(artist_id):
         )
         artist.seeking_description = request.form["seeking_description"]
         db.session.commit()
-    except:
+        page_cache.invalidate(*artist_scopes(artist_id), *scopes)
+    except Exception:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception("Could not update artist %s", artist_id)
     finally:
         db.session.close()
         if error:
@@ -487,10 +754,7 @@ def delete_artist(artist_id):
     artist = Artist.query.filter_by(id=artist_id).one_or_none()
     if artist is None:
         abort(404)
-    db.session.delete(artist)
-    db.session.commit()
-
-    return {"success": True}
+    return delete_entity("artists", artist, artist_scopes(artist_id))
 
 
 #  Create Artist
@@ -522,12 +786,14 @@ def create_artist_submission():
             else False
         )
         artist.seeking_description = request.form["seeking_description"]
+        scopes = match_scopes(Artist, artist.state, artist.city, artist.genres)
         db.session.add(artist)
         db.session.commit()
-    except:
+        page_cache.invalidate("artists", *scopes)
+    except Exception:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception("Could not create artist")
     finally:
         db.session.close()
         if error:
@@ -546,19 +812,17 @@ def create_artist_submission():
 
 
 @app.route("/shows")
+@page_cache.cached("shows")
 def shows():
-    data = [
-        {
-            "venue_id": show.venue_id,
-            "venue_name": Venue.query.get(show.venue_id).name,
-            "artist_id": show.artist_id,
-            "artist_name": Artist.query.get(show.artist_id).name,
-            "artist_image_link": Artist.query.get(show.artist_id).image_link,
-            "start_time": str(show.start_time),
-        }
-        for show in Show.query.all()
-    ]
-    return render_template("pages/shows.html", shows=data)
+    genres = requested_genres()
+    query = shows_query()
+    facets = cached_facets("shows", "shows", query, Artist.genres, genres)
+    query = filter_genres(query, Artist.genres, genres)
+    page = paginate(query, [Show.start_time, Show.id])
+    data = [show_row_dict(row) for row in page.items]
+    return render_template(
+        "pages/shows.html", shows=data, page=page, genres=genres, facets=facets
+    )
 
 
 @app.route("/shows/create")
@@ -569,51 +833,269 @@ def create_shows():
 
 @app.route("/shows/create", methods=["POST"])
 def create_show_submission():
+    form = ShowForm()
+    if not form.validate():
+        return render_template("forms/new_show.html", form=form), 400
+
     error = False
     try:
         show = Show()
-        show.artist_id = request.form["artist_id"]
-        show.venue_id = request.form["venue_id"]
-        show.start_time = request.form["start_time"]
+        show.artist_id = form.artist_id.data
+        show.venue_id = form.venue_id.data
+        show.start_time = form.start_time.data
+        if form.end_time.data:
+            show.end_time = form.end_time.data
         db.session.add(show)
         db.session.commit()
-    except:
+        page_cache.invalidate(
+            "shows",
+            "venues",
+            "venue:{}".format(show.venue_id),
+            "artist:{}".format(show.artist_id),
+        )
+    except IntegrityError as e:
+        db.session.rollback()
+        conflict = bookings.conflict_message(e)
+        if conflict is not None:
+            form.start_time.errors.append(conflict)
+            return render_template("forms/new_show.html", form=form), 409
+        error = True
+        app.logger.exception("Could not create show")
+    except Exception:
         error = True
         db.session.rollback()
-        print(sys.exc_info())
-    finally:
-        db.session.close()
-        if error:
-            flash("An error occurred. Show could not be listed.")
-        else:
-            flash("Show was successfully listed!")
-        return render_template("pages/home.html")
+        app.logger.exception("Could not create show")
+    db.session.close()
+    if error:
+        flash("An error occurred. Show could not be listed.")
+    else:
+        flash("Show was successfully listed!")
+    return render_template("pages/home.html")
 
 
-@app.route("/shows/search", methods=["POST"])
-# TODO search shows
+@app.route("/shows/search", methods=["GET", "POST"])
 def search_shows():
-    search_term = request.form.get("search_term", "")
-
-    shows = [
-        {
-            "venue_id": show.venue_id,
-            "venue_name": Venue.query.get(show.venue_id).name,
-            "artist_id": show.artist_id,
-            "artist_name": Artist.query.get(show.artist_id).name,
-            "artist_image_link": Artist.query.get(show.artist_id).image_link,
-            "start_time": str(show.start_time),
-        }
-        for show in Show.query.all()
-    ]
+    search_term = request.values.get("search_term", "")
+
+    genres = requested_genres()
+
+    query = search.search_shows(shows_query(), Artist, Venue, search_term)
+    facets = cached_facets(
+        "shows:" + search_term, "shows", query, Artist.genres, genres
+    )
+    query = filter_genres(query, Artist.genres, genres)
+    page = paginate(query, [Show.start_time, Show.id])
+    shows = [show_row_dict(row) for row in page.items]
 
     response = {
-        "count": len(shows),
+        "count": query.count(),
         "data": shows,
     }
     return render_template(
-        "pages/search_shows.html", results=response, search_term=search_term,
+        "pages/search_shows.html",
+        results=response,
+        search_term=search_term,
+        page=page,
+        genres=genres,
+        facets=facets,
+    )
+
+
+#  Import
+#  ----------------------------------------------------------------
+
+
+def shows_imported(values):
+    stats.refresh(db.session, "venues", [show["venue_id"] for show in values])
+    stats.refresh(db.session, "artists", [show["artist_id"] for show in values])
+    db.session.commit()
+    page_cache.invalidate(
+        "shows",
+        "venues",
+        *{"venue:{}".format(show["venue_id"]) for show in values},
+        *{"artist:{}".format(show["artist_id"]) for show in values}
+    )
+
+
+IMPORTERS = {
+    "artists": Importer(
+        Artist,
+        ArtistForm,
+        on_insert=lambda values: page_cache.invalidate(
+            *imported_scopes(Artist, values)
+        ),
+    ),
+    "venues": Importer(
+        Venue,
+        VenueForm,
+        on_insert=lambda values: page_cache.invalidate(
+            *imported_scopes(Venue, values)
+        ),
+    ),
+    "shows": Importer(
+        Show,
+        ShowForm,
+        references={"artist": Artist, "venue": Venue},
+        on_insert=shows_imported,
+    ),
+}
+
+
+@app.cli.command("import")
+@click.argument("kind", type=click.Choice(sorted(IMPORTERS)))
+@click.argument("source", type=click.File("r", encoding="utf-8"))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]))
+@click.option("--batch-size", type=int, default=None)
+def import_command(kind, source, fmt, batch_size):
+    """ Imports artists, venues or shows from a CSV or JSON Lines file. """
+    fmt = fmt or guess_format(source.name)
+    if fmt is None:
+        raise click.BadParameter("cannot guess the format, use --format")
+    batch_size = batch_size or app.config["IMPORT_BATCH_SIZE"]
+    inserted = failed = 0
+    for report in IMPORTERS[kind].run(db.session, source, fmt, batch_size):
+        inserted += report["inserted"]
+        failed += len(report["errors"])
+        for error in report["errors"]:
+            click.echo(json.dumps(dict(error, batch=report["batch"])), err=True)
+    click.echo("Imported {} {}, {} errors".format(inserted, kind, failed))
+
+
+@app.route("/import/<kind>", methods=["POST"])
+def import_upload(kind):
+    token = app.config.get("IMPORT_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(authorization, "Bearer " + token):
+        abort(401)
+    if kind not in IMPORTERS:
+        abort(404)
+    upload = request.files.get("file")
+    if upload is None:
+        abort(400)
+    fmt = request.args.get("format") or guess_format(upload.filename)
+    if fmt not in ("csv", "jsonl"):
+        abort(400)
+
+    source = io.TextIOWrapper(upload.stream, encoding="utf-8", newline="")
+    batch_size = app.config["IMPORT_BATCH_SIZE"]
+    batches = list(IMPORTERS[kind].run(db.session, source, fmt, batch_size))
+    return {
+        "inserted": sum(batch["inserted"] for batch in batches),
+        "failed": sum(len(batch["errors"]) for batch in batches),
+        "batches": batches,
+    }
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+
+def latest(*columns):
+    """ Returns the SQL expression of the latest of columns, none of them NULL """
+    expression = columns[0]
+    for column in columns[1:]:
+        expression = db.case((column > expression, column), else_=expression)
+    return expression
+
+
+def export_query(kind, since=None, until=None):
+    """ Returns the rows to export for kind, streamed from a server-side cursor
+
+    With since, only rows updated after it are exported, oldest change first,
+    so the until of one export is the since of the next. The rows updated in
+    the EXPORT_OVERLAP_SECONDS before since are exported again: updated_at is
+    when the writing transaction started, so a row can be committed after an
+    export with an updated_at before its until. Every change is exported at
+    least once as long as no write transaction outlasts the overlap, and
+    consumers drop the rows whose (id, updated_at) they already have.
+
+    A show carries the names of its artist and venue, so it is updated, and
+    exported again, when either of them is.
+    """
+    if kind == "shows":
+        model = Show
+        updated_at = latest(Show.updated_at, Artist.updated_at, Venue.updated_at)
+        query = (
+            db.session.query(
+                Show.id,
+                Show.artist_id,
+                Artist.name.label("artist_name"),
+                Show.venue_id,
+                Venue.name.label("venue_name"),
+                Show.start_time,
+                Show.end_time,
+                updated_at.label("updated_at"),
+            )
+            .join(Artist, Show.artist_id == Artist.id)
+            .join(Venue, Show.venue_id == Venue.id)
+        )
+    else:
+        model = {"artists": Artist, "venues": Venue}[kind]
+        updated_at = model.updated_at
+        query = db.session.query(*model.__table__.columns)
+
+    if until is not None:
+        query = query.filter(updated_at <= until)
+    if since is not None:
+        overlap = timedelta(seconds=app.config["EXPORT_OVERLAP_SECONDS"])
+        query = query.filter(updated_at > since - overlap).order_by(
+            updated_at, model.id
+        )
+    else:
+        query = query.order_by(model.id)
+    return query.yield_per(app.config["EXPORT_BATCH_SIZE"])
+
+
+def export_watermark():
+    """ Returns the database clock, the until of an export starting now
+
+    Rows written by transactions still open now may carry an updated_at
+    before it, which is why the next export reaches back past its since.
+    """
+    return db.session.query(db.func.now()).scalar()
+
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(["artists", "shows", "venues"]))
+@click.option("--format", "fmt", type=click.Choice(exporter.FORMATS), default="jsonl")
+@click.option("--since", type=click.DateTime(), default=None)
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-")
+def export_command(kind, fmt, since, output):
+    """ Exports artists, venues or shows as JSON Lines or CSV. """
+    until = export_watermark()
+    query = export_query(kind, since, until)
+    fields = [column["name"] for column in query.column_descriptions]
+    for chunk in exporter.serialize(query, fields, fmt):
+        output.write(chunk)
+    click.echo("Watermark: {}".format(until.isoformat(sep=" ")), err=True)
+
+
+@app.route("/export/<kind>")
+def export_download(kind):
+    token = app.config.get("EXPORT_TOKEN")
+    authorization = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(authorization, "Bearer " + token):
+        abort(401)
+    if kind not in ("artists", "shows", "venues"):
+        abort(404)
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in exporter.FORMATS:
+        abort(400)
+    since = request.args.get("since")
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        abort(400)
+
+    until = export_watermark()
+    query = export_query(kind, since, until)
+    fields = [column["name"] for column in query.column_descriptions]
+    response = Response(
+        stream_with_context(exporter.serialize(streamed(query), fields, fmt)),
+        mimetype=exporter.MIMETYPES[fmt],
     )
+    response.headers["X-Export-Watermark"] = until.isoformat(sep=" ")
+    return response
 
 
 @app.errorhandler(404)
@@ -626,27 +1108,11 @@ def server_error(error):
     return render_template("errors/500.html"), 500
 
 
-if not app.debug:
-    file_handler = FileHandler("error.log")
-    file_handler.setFormatter(
-        Formatter("%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]")
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info("errors")
-
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
-# Default port:
+# Development server only, see wsgi.py for production:
 if __name__ == "__main__":
-    app.run()
-
-# Or specify port manually:
-"""
-if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-"""
+    port = int(os.environ.get("PORT", 5000))
+    app.run(port=port)
@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+try:
+    import rcssmin
+except ImportError:  # pragma: no cover - rcssmin is optional
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:  # pragma: no cover - rjsmin is optional
+    rjsmin = None
+
+# Files the layout loads, concatenated in this order. The head bundle runs
+# before the page renders, the site bundle is deferred.
+BUNDLES = {
+    "css/site.css": [
+        "css/bootstrap.min.css",
+        "css/layout.main.css",
+        "css/main.css",
+        "css/main.responsive.css",
+        "css/main.quickfix.css",
+    ],
+    "js/head.js": ["js/libs/modernizr-2.8.2.min.js"],
+    "js/site.js": [
+        "js/libs/bootstrap-3.1.1.min.js",
+        "js/plugins.js",
+        "js/script.js",
+    ],
+}
+# Subdirectory of the static folder the build is written to
+BUILD_DIR = "dist"
+MANIFEST = "manifest.json"
+# Built files worth compressing, the others (images, woff) already are
+COMPRESSED = (".css", ".js", ".map", ".svg", ".ttf", ".otf", ".eot")
+# Content-Encoding -> suffix of the precompressed files, best first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+def minify(name, text):
+    """ Returns text minified, if it is CSS or JavaScript and the minifier
+    for it is installed"""
+    if name.endswith(".css") and rcssmin is not None:
+        return rcssmin.cssmin(text)
+    if name.endswith(".js") and rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text
+
+
+def fingerprinted(name, data):
+    """ Returns name with the start of data's SHA-256 before its extension """
+    root, extension = posixpath.splitext(name)
+    return "{}.{}{}".format(root, hashlib.sha256(data).hexdigest()[:12], extension)
+
+
+def rebase_urls(css, source, target, manifest):
+    """ Rewrites the relative url()s of the stylesheet source for it to be
+    served as target, pointing at the built copies in manifest if any"""
+
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(("/", "data:", "#")) or "//" in url:
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        resolved = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        resolved = manifest.get(resolved, resolved)
+        rebased = posixpath.relpath(resolved, posixpath.dirname(target))
+        return "url({0}{1}{2}{0})".format(quote, rebased, suffix)
+
+    return CSS_URL.sub(rebase, css)
+
+
+def build(static_folder):
+    """ Writes the bundles and a fingerprinted copy of every static file to
+    the build directory, precompressed, and returns the manifest mapping
+    their names to the built ones"""
+    output = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+    manifest = {}
+
+    def write(name, data):
+        built = posixpath.join(BUILD_DIR, fingerprinted(name, data))
+        path = os.path.join(static_folder, built)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+        if name.endswith(COMPRESSED):
+            with open(path + ENCODINGS["gzip"], "wb") as file:
+                file.write(gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                with open(path + ENCODINGS["br"], "wb") as file:
+                    file.write(brotli.compress(data))
+        manifest[name] = built
+
+    for directory, subdirectories, files in os.walk(static_folder):
+        subdirectories[:] = [d for d in subdirectories if d != BUILD_DIR]
+        for file in sorted(files):
+            if file.startswith("."):
+                continue
+            path = os.path.join(directory, file)
+            name = os.path.relpath(path, static_folder).replace(os.sep, "/")
+            with open(path, "rb") as source:
+                write(name, source.read())
+
+    for bundle, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding="utf-8") as file:
+                text = file.read()
+            if source.endswith(".css"):
+                target = posixpath.join(BUILD_DIR, bundle)
+                text = rebase_urls(text, source, target, manifest)
+            parts.append(minify(source, text))
+        # A script not ending in a semicolon must not run into the next one
+        separator = ";\n" if bundle.endswith(".js") else "\n"
+        write(bundle, separator.join(parts).encode("utf-8"))
+
+    with open(os.path.join(output, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    return manifest
+
+
+class Assets:
+    """ Points static URLs at the fingerprinted files of the last build
+
+    With ASSETS_HASHED on and a manifest in the build directory,
+    url_for("static", filename=...) of a built file gives its fingerprinted
+    copy, served with a far-future immutable Cache-Control and precompressed
+    when the client accepts it, so a page reloaded fetches nothing. Without
+    a build, the source files are served as they are.
+    """
+
+    def __init__(self, app=None):
+        self.manifest = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.folder = os.path.join(app.static_folder, BUILD_DIR)
+        path = os.path.join(self.folder, MANIFEST)
+        if app.config["ASSETS_HASHED"] and os.path.exists(path):
+            with open(path) as file:
+                self.manifest = json.load(file)
+        app.url_defaults(self.fingerprint)
+        app.add_url_rule(
+            "{}/{}/<path:filename>".format(app.static_url_path, BUILD_DIR),
+            "built_static",
+            self.send,
+        )
+        app.jinja_env.globals["asset_urls"] = self.urls
+        app.extensions["assets"] = self
+
+    def fingerprint(self, endpoint, values):
+        if endpoint == "static" and values.get("filename") in self.manifest:
+            values["filename"] = self.manifest[values["filename"]]
+
+    def urls(self, bundle):
+        """ Returns the URLs to load bundle from: the built one, or else its
+        sources"""
+        if bundle in self.manifest:
+            return [url_for("static", filename=bundle)]
+        return [url_for("static", filename=source) for source in BUNDLES[bundle]]
+
+    def send(self, filename):
+        """ Serves a built file, precompressed if the client accepts it """
+        path = safe_join(self.folder, filename)
+        if path is None:
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        encoding = None
+        for name, suffix in ENCODINGS.items():
+            if request.accept_encodings[name] and os.path.exists(path + suffix):
+                encoding = name
+                filename += suffix
+                break
+        response = send_from_directory(self.folder, filename, mimetype=mimetype)
+        if encoding is not None:
+            response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = "public, max-age={}, immutable".format(
+            self.app.config["ASSETS_MAX_AGE"]
+        )
+        return response
@@ -0,0 +1,64 @@
+""" Times the `datetime` template filter per call, before and after caching
+
+    $ DATABASE_URL=sqlite:// python -m benchmarks.datetime_filter
+
+"before" is the filter as it used to be: the view passed str(start_time),
+which was parsed again with dateutil and formatted with a pattern Babel
+compiled on every call.
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime
+
+
+def legacy_format_datetime(value, format="medium"):
+    date = dateutil.parser.parse(value)
+    if format == "full":
+        format = "EEEE | d MMMM y | HH:MM"
+    elif format == "medium":
+        format = "EE MM, dd, y HH:MM"
+    return babel.dates.format_datetime(date, format)
+
+
+def per_call(function, values, format, repeat):
+    """ Returns the best time of one call of function in microseconds """
+    runs = timeit.repeat(
+        lambda: [function(value, format) for value in values], number=1, repeat=repeat
+    )
+    return min(runs) / len(values) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    start = datetime(2020, 6, 1, 20, 30)
+    times = [start + timedelta(hours=7 * i) for i in range(args.calls)]
+    strings = [str(value) for value in times]
+
+    print(
+        "{:<10}{:>14}{:>14}{:>10}".format("format", "before us", "after us", "speedup")
+    )
+    for format in ("full", "medium"):
+        assert [legacy_format_datetime(s, format) for s in strings] == [
+            format_datetime(t, format) for t in times
+        ]
+        before = per_call(legacy_format_datetime, strings, format, args.repeat)
+        after = per_call(format_datetime, times, format, args.repeat)
+        print(
+            "{:<10}{:>14.2f}{:>14.2f}{:>9.1f}x".format(
+                format, before, after, before / after
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+""" Load tests the site and reports throughput and latency per worker count
+
+    $ DATABASE_URL=postgresql:///fayir_bench python -m benchmarks.load --workers 1 2 4
+
+Each worker count gets its own gunicorn (gunicorn.conf.py, the production
+profile) on --port, driven by --concurrency client threads for --duration
+seconds. With --url the server already running there is tested instead.
+The page cache is off, so every request reaches the database.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+PATHS = [
+    "/venues",
+    "/artists",
+    "/shows",
+    "/venues/1",
+    "/artists/1",
+    "/api/v1/shows?limit=50",
+    "/api/v1/calendar",
+]
+
+
+def fetch(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def drive(base_url, paths, concurrency, duration):
+    """ Returns the latencies and failure count of requests cycling through
+    paths from concurrency threads for duration seconds"""
+    deadline = time.monotonic() + duration
+    latencies, failures = [], [0]
+    lock = threading.Lock()
+
+    def client(offset):
+        number = offset
+        while time.monotonic() < deadline:
+            url = base_url + paths[number % len(paths)]
+            number += 1
+            start = time.perf_counter()
+            status = fetch(url)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status >= 500:
+                    failures[0] += 1
+
+    threads = [
+        threading.Thread(target=client, args=(offset,)) for offset in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures[0]
+
+
+def report(label, latencies, failures, duration):
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        "{:>10}  {:8.1f} req/s  p50 {:6.1f} ms  p99 {:7.1f} ms  {} errors".format(
+            label,
+            len(latencies) / duration,
+            quantiles[49] * 1000,
+            quantiles[98] * 1000,
+            failures,
+        )
+    )
+
+
+def serve(workers, threads, port):
+    """ Starts gunicorn with workers processes and waits until it answers """
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(threads),
+        GUNICORN_BIND="127.0.0.1:{}".format(port),
+        FAYIR_CACHE_BACKEND="null",
+        SECRET_KEY=os.environ.get("SECRET_KEY", "load-test"),
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "wsgi:application",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = "http://127.0.0.1:{}".format(port)
+    for _ in range(100):
+        try:
+            fetch(url + "/")
+            return server, url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise SystemExit("gunicorn did not start on port {}".format(port))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Test this running server instead.")
+    parser.add_argument("--path", action="append", dest="paths")
+    args = parser.parse_args()
+    paths = args.paths or PATHS
+
+    if args.url:
+        drive(args.url, paths, args.concurrency, args.warmup)
+        latencies, failures = drive(args.url, paths, args.concurrency, args.duration)
+        report(args.url, latencies, failures, args.duration)
+        return
+
+    for workers in args.workers:
+        server, url = serve(workers, args.threads, args.port)
+        try:
+            drive(url, paths, args.concurrency, args.warmup)
+            latencies, failures = drive(url, paths, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+        report("{} workers".format(workers), latencies, failures, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+""" Drives every route of the app and records latency, queries and throughput
+
+    $ DATABASE_URL=postgresql:///fayir_bench python -m benchmarks.routes -o new.json
+    $ DATABASE_URL=sqlite:// python -m benchmarks.routes --compare before.json new.json
+
+Requests go through the test client, in process and one at a time, with the
+page cache off so each one does its full work; benchmarks.load measures a
+real server under concurrency. The write routes change the data, so run it
+against a scratch database seeded by benchmarks.seed, never at real data.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("FAYIR_CONFIG", "testing")
+os.environ.setdefault("FAYIR_CACHE_BACKEND", "null")
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app, db, Artist, Venue, Show, VenueStats  # noqa: E402
+from benchmarks.seed import WORDS  # noqa: E402
+
+TOKEN = "benchmark"
+# Endpoints left out: off unless PROFILE_DIR is set, or static files are built
+SKIPPED = ("profiles", "profile_file", "built_static")
+
+
+def row_counts():
+    return {
+        "venues": db.session.query(db.func.count(Venue.id)).scalar(),
+        "artists": db.session.query(db.func.count(Artist.id)).scalar(),
+        "shows": db.session.query(db.func.count(Show.id)).scalar(),
+    }
+
+
+def busiest(column):
+    """ Returns the id with the most shows in column """
+    return (
+        db.session.query(column)
+        .group_by(column)
+        .order_by(db.func.count().desc())
+        .limit(1)
+        .scalar()
+    )
+
+
+def typical_venue():
+    """ Returns the id of the venue with the median number of shows """
+    total = VenueStats.upcoming_shows_count + VenueStats.past_shows_count
+    count = db.session.query(db.func.count(VenueStats.venue_id)).scalar()
+    return (
+        db.session.query(VenueStats.venue_id)
+        .order_by(total)
+        .offset(count // 2)
+        .limit(1)
+        .scalar()
+    )
+
+
+def entity_form(entity):
+    """ Returns the edit form data of a venue or artist """
+    data = {
+        key: "" if value is None else value
+        for key, value in entity.to_dict().items()
+        if key not in ("id", "genres")
+    }
+    data["genres"] = entity.genres or ["Jazz"]
+    for key in ("seeking_talent", "seeking_venue"):
+        if key in data:
+            data[key] = "y" if data[key] else ""
+    return data
+
+
+def new_form(rng, kind):
+    data = {
+        "name": "Benchmark {} {}".format(kind, rng.randrange(10**9)),
+        "city": "Austin",
+        "state": "TX",
+        "address": "1 Benchmark St",
+        "phone": "326-123-0000",
+        "genres": ["Jazz", "Blues"],
+        "facebook_link": "https://www.facebook.com/benchmark",
+        "website": "https://example.com",
+        "image_link": "https://example.com/b.jpg",
+        "seeking_description": "",
+    }
+    if kind == "artist":
+        del data["address"]
+    return data
+
+
+def throwaway(model, shows, artist_id, venue_id):
+    """ Inserts a venue or artist with shows to be deleted, returns its id """
+    with app.app_context():
+        entity = model(name="Benchmark throwaway", city="Austin", state="TX")
+        db.session.add(entity)
+        db.session.flush()
+        start = datetime.today() + timedelta(days=2000 + random.randrange(10**5))
+        for number in range(shows):
+            show = Show(
+                start_time=start + timedelta(days=number),
+                artist_id=entity.id if model is Artist else artist_id,
+                venue_id=entity.id if model is Venue else venue_id,
+            )
+            db.session.add(show)
+        db.session.commit()
+        return entity.id
+
+
+def scenarios(rng):
+    """ Returns (name, method, request[, check]) tuples covering every route
+
+    request is called before each request (outside of the timing) and returns
+    the path and the keyword arguments of the test client call. check, when
+    given, is called with each response and stops the run if the route did
+    not do its work, which would make its timing meaningless.
+    """
+    venue, artist = busiest(Show.venue_id), busiest(Show.artist_id)
+    venue_id = typical_venue()
+    artist_id = (
+        db.session.query(Show.artist_id).filter_by(venue_id=venue_id).limit(1).scalar()
+    )
+    show_id = db.session.query(db.func.min(Show.id)).scalar()
+    term = db.session.get(Venue, venue_id).name.split()[0]
+    venue_form = entity_form(db.session.get(Venue, venue_id))
+    artist_form = entity_form(db.session.get(Artist, artist_id))
+    auth = {"Authorization": "Bearer " + TOKEN}
+    csv = "name,city,state,phone,genres,facebook_link,website,image_link\n" + "".join(
+        "Imported {0},Austin,TX,1,Jazz,https://www.facebook.com/imported{0},"
+        "https://example.com/{0},https://example.com/{0}.jpg\n".format(n)
+        for n in range(20)
+    )
+
+    def get(path, **kwargs):
+        return lambda: (path, kwargs)
+
+    def form(path, data):
+        return lambda: (path, {"data": data()})
+
+    def new_show():
+        start = datetime.today() + timedelta(days=rng.randrange(400, 4000))
+        return {
+            "artist_id": artist_id,
+            "venue_id": venue_id,
+            "start_time": start.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def availability():
+        start = datetime.today() + timedelta(days=1)
+        slots = [
+            {
+                "venue_id": venue,
+                "artist_id": artist,
+                "start_time": (start + timedelta(hours=3 * n)).isoformat(),
+            }
+            for n in range(20)
+        ]
+        return "/api/v1/shows/availability", {"json": {"slots": slots}}
+
+    def upload():
+        data = {"file": (io.BytesIO(csv.encode()), "artists.csv")}
+        return "/import/artists", {"headers": auth, "data": data}
+
+    def imported(response):
+        failed = response.get_json()["failed"]
+        if failed:
+            raise SystemExit("{} rows of the import failed validation".format(failed))
+
+    def delete(model, kind):
+        return lambda: (
+            "/{}/{}".format(kind, throwaway(model, 20, artist_id, venue_id)),
+            {},
+        )
+
+    return [
+        ("home", "GET", get("/")),
+        ("static file", "GET", get("/static/css/main.css")),
+        ("cache stats", "GET", get("/cache/stats")),
+        ("metrics", "GET", get("/metrics")),
+        ("venues", "GET", get("/venues")),
+        ("venues by genre", "GET", get("/venues?genre=Jazz")),
+        ("venue search", "GET", get("/venues/search?search_term=" + term)),
+        (
+            "venue search, short",
+            "POST",
+            form("/venues/search", lambda: {"search_term": "a"}),
+        ),
+        ("busiest venue", "GET", get("/venues/{}".format(venue))),
+        ("typical venue", "GET", get("/venues/{}".format(venue_id))),
+        ("venue create form", "GET", get("/venues/create")),
+        (
+            "venue create",
+            "POST",
+            form("/venues/create", lambda: new_form(rng, "venue")),
+        ),
+        ("venue edit form", "GET", get("/venues/{}/edit".format(venue_id))),
+        (
+            "venue edit",
+            "POST",
+            form("/venues/{}/edit".format(venue_id), lambda: venue_form),
+        ),
+        ("venue delete", "DELETE", delete(Venue, "venues")),
+        ("artists", "GET", get("/artists")),
+        ("artist search", "GET", get("/artists/search?search_term=" + term)),
+        (
+            "artist search, form",
+            "POST",
+            form("/artists/search", lambda: {"search_term": rng.choice(WORDS)}),
+        ),
+        ("busiest artist", "GET", get("/artists/{}".format(artist))),
+        ("typical artist", "GET", get("/artists/{}".format(artist_id))),
+        ("artist create form", "GET", get("/artists/create")),
+        (
+            "artist create",
+            "POST",
+            form("/artists/create", lambda: new_form(rng, "artist")),
+        ),
+        ("artist edit form", "GET", get("/artists/{}/edit".format(artist_id))),
+        (
+            "artist edit",
+            "POST",
+            form("/artists/{}/edit".format(artist_id), lambda: artist_form),
+        ),
+        ("artist delete", "DELETE", delete(Artist, "artists")),
+        ("shows", "GET", get("/shows")),
+        ("shows by genre", "GET", get("/shows?genre=Rock+n+Roll&genre=Jazz")),
+        ("show search", "GET", get("/shows/search?search_term=" + term)),
+        (
+            "show search, form",
+            "POST",
+            form("/shows/search", lambda: {"search_term": rng.choice(WORDS)}),
+        ),
+        ("show create form", "GET", get("/shows/create")),
+        ("show create", "POST", form("/shows/create", new_show)),
+        ("import artists", "POST", upload, imported),
+        ("export venues", "GET", get("/export/venues", headers=auth)),
+        ("api venues", "GET", get("/api/v1/venues?limit=50")),
+        (
+            "api artists, fields",
+            "GET",
+            get("/api/v1/artists?fields=name,city&genre=Jazz"),
+        ),
+        (
+            "api busiest venue",
+            "GET",
+            get("/api/v1/venues/{}?include=upcoming_shows,past_shows".format(venue)),
+        ),
+        ("api venue matches", "GET", get("/api/v1/venues/{}/matches".format(venue_id))),
+        ("api shows", "GET", get("/api/v1/shows?limit=50")),
+        ("api show", "GET", get("/api/v1/shows/{}".format(show_id))),
+        ("api availability", "POST", availability),
+        ("api calendar", "GET", get("/api/v1/calendar")),
+        (
+            "api calendar, venue ics",
+            "GET",
+            get("/api/v1/calendar?format=ics&venue_id={}".format(venue)),
+        ),
+    ]
+
+
+def endpoint(path, method):
+    """ Returns the endpoint of the app serving a request """
+    urls = app.url_map.bind("localhost")
+    return urls.match(path.partition("?")[0], method=method)[0]
+
+
+def uncovered(covered):
+    """ Returns the routes of the app missing from the covered (endpoint,
+    method) pairs"""
+    return [
+        "{} {}".format(method, rule.rule)
+        for rule in app.url_map.iter_rules()
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"})
+        if (rule.endpoint, method) not in covered and rule.endpoint not in SKIPPED
+    ]
+
+
+def measure(client, method, request, repeat, queries, checks=()):
+    """ Returns the latencies (ms), query counts and statuses of repeat calls,
+    and the last path requested"""
+    latencies, counts, statuses = [], [], {}
+    for _ in range(repeat):
+        path, kwargs = request()
+        queries[0] = 0
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts.append(queries[0])
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        for check in checks:
+            check(response)
+        response.close()
+    return latencies, counts, statuses, path
+
+
+def summary(latencies, counts, statuses, path):
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "path": path,
+        "p50_ms": round(quantiles[49], 3),
+        "p95_ms": round(quantiles[94], 3),
+        "p99_ms": round(quantiles[98], 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "queries": round(statistics.fmean(counts), 2),
+        "max_queries": max(counts),
+        "throughput_rps": round(len(latencies) * 1000 / sum(latencies), 1),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    app.config.update(IMPORT_TOKEN=TOKEN, EXPORT_TOKEN=TOKEN)
+    rng = random.Random(args.seed)
+    queries = [0]
+
+    def count(*_):
+        queries[0] += 1
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", count)
+        if db.session.query(Show.id).first() is None:
+            raise SystemExit("No shows: seed the database with benchmarks.seed first")
+        rows = row_counts()
+        cases = scenarios(rng)
+        dialect = db.engine.dialect.name
+        db.session.remove()
+
+    client = app.test_client()
+    routes, covered = {}, set()
+    for name, method, request, *checks in cases:
+        if args.only and not any(part in name for part in args.only):
+            continue
+        if args.warmup:
+            measure(client, method, request, args.warmup, queries, checks)
+        results = summary(
+            *measure(client, method, request, args.repeat, queries, checks)
+        )
+        routes[name] = dict(method=method, **results)
+        covered.add((endpoint(results["path"], method), method))
+        print(
+            "{:<26}{:>9.2f}{:>9.2f}{:>9.2f}{:>8.1f}{:>9.1f}".format(
+                name,
+                results["p50_ms"],
+                results["p95_ms"],
+                results["p99_ms"],
+                results["queries"],
+                results["throughput_rps"],
+            )
+        )
+
+    if not args.only:
+        for route in uncovered(covered):
+            print("Not benchmarked: " + route, file=sys.stderr)
+    return {
+        "commit": commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "dialect": dialect,
+        "rows": rows,
+        "repeat": args.repeat,
+        "routes": routes,
+    }
+
+
+def compare(before, after, threshold):
+    """ Prints the change of each route between two result files and returns
+    the number of regressions: p95 slower by more than threshold, or more
+    queries per request"""
+    print(
+        "{:<26}{:>10}{:>10}{:>8}{:>8}{:>8}".format(
+            "route", "p95 before", "p95 after", "change", "queries", "after"
+        )
+    )
+    regressions = 0
+    for name, new in after["routes"].items():
+        old = before["routes"].get(name)
+        if old is None:
+            continue
+        change = new["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        regressed = change > threshold or new["queries"] > old["queries"]
+        regressions += regressed
+        print(
+            "{:<26}{:>10.2f}{:>10.2f}{:>+7.0f}%{:>8.1f}{:>8.1f}{}".format(
+                name,
+                old["p95_ms"],
+                new["p95_ms"],
+                change * 100,
+                old["queries"],
+                new["queries"],
+                "  REGRESSION" if regressed else "",
+            )
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="Routes whose name contains any.")
+    parser.add_argument("--output", "-o", type=argparse.FileType("w"))
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="p95 slowdown that fails."
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (json.load(open(path)) for path in args.compare)
+        sys.exit(1 if compare(before, after, args.threshold) else 0)
+
+    print(
+        "{:<26}{:>9}{:>9}{:>9}{:>8}{:>9}".format(
+            "route", "p50 ms", "p95 ms", "p99 ms", "queries", "req/s"
+        )
+    )
+    results = run(args)
+    if args.output:
+        json.dump(results, args.output, indent=2)
+        args.output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+""" Seeds the configured database with synthetic venues, artists and shows
+
+    $ DATABASE_URL=postgresql:///fayir_bench python -m benchmarks.seed --shows 100000
+
+It scales from 10k to 10M shows, with a venue per 100 shows and an artist
+per 20 unless given. Show counts follow a Zipf-like distribution, so a
+handful of venues and artists carry very long histories, like real veteran
+venues do.
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from app import app, db, Artist, Venue, Show
+from bookings import DEFAULT_DURATION
+from genres import GENRES
+import stats
+
+CITIES = [
+    ("New York", "NY"),
+    ("Los Angeles", "CA"),
+    ("San Francisco", "CA"),
+    ("Chicago", "IL"),
+    ("Houston", "TX"),
+    ("Austin", "TX"),
+    ("Dallas", "TX"),
+    ("Phoenix", "AZ"),
+    ("Philadelphia", "PA"),
+    ("Seattle", "WA"),
+    ("Denver", "CO"),
+    ("Boston", "MA"),
+    ("Nashville", "TN"),
+    ("Portland", "OR"),
+    ("Las Vegas", "NV"),
+    ("Detroit", "MI"),
+    ("Memphis", "TN"),
+    ("Atlanta", "GA"),
+    ("Miami", "FL"),
+    ("New Orleans", "LA"),
+]
+WORDS = [
+    "Blue",
+    "Velvet",
+    "Hop",
+    "Musical",
+    "Park",
+    "Dueling",
+    "Pianos",
+    "Bar",
+    "Guns",
+    "Petals",
+    "Matt",
+    "Quevedo",
+    "Wild",
+    "Sax",
+    "Band",
+    "Hall",
+    "Room",
+    "Cellar",
+    "Garden",
+    "Tavern",
+]
+
+
+SLOT_HOURS = int(DEFAULT_DURATION.total_seconds() // 3600)
+# Three years of history and one year of upcoming shows, in show-long slots
+SLOTS = (-3 * 365 * 24 // SLOT_HOURS, 365 * 24 // SLOT_HOURS)
+
+
+def name(rng, words=3):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + " {}".format(
+        rng.randrange(100000)
+    )
+
+
+def zipf_weights(n):
+    """ Returns cumulative Zipf-like weights for n ranked items """
+    return list(accumulate(1.0 / (rank + 1) for rank in range(n)))
+
+
+def distinct_choices(rng, ids, weights, k):
+    """ Returns k distinct ids drawn with weights, the heavy ones most often """
+    chosen = {}
+    while len(chosen) < k:
+        for id in rng.choices(ids, cum_weights=weights, k=k - len(chosen)):
+            chosen[id] = None
+    return list(chosen)[:k]
+
+
+def insert(table, rows, batch):
+    for start in range(0, len(rows), batch):
+        db.session.execute(table.insert(), rows[start : start + batch])
+
+
+def default_sizes(shows):
+    """ Returns the numbers of venues and artists to go with shows """
+    return max(100, shows // 100), max(500, shows // 20)
+
+
+def seed(venues, artists, shows, seed=0, batch=10000):
+    """ Inserts the given numbers of synthetic venues, artists and shows
+
+    Shows are spread evenly over the slots; each slot gets its venues and
+    artists drawn without repetition, so nobody is double-booked, with Zipf
+    weights. The busiest venues and artists thus play in nearly every slot.
+    """
+    rng = random.Random(seed)
+    now = datetime.today()
+
+    rows = []
+    for _ in range(venues):
+        city, state = rng.choice(CITIES)
+        rows.append(
+            {
+                "name": name(rng),
+                "city": city,
+                "state": state,
+                "address": "{} {} St".format(rng.randrange(9999), rng.choice(WORDS)),
+                "phone": "326-123-{:04d}".format(rng.randrange(10000)),
+                "genres": rng.sample(GENRES, rng.randint(1, 3)),
+                "image_link": "https://example.com/v/{}.jpg".format(len(rows)),
+                "seeking_talent": rng.random() < 0.3,
+            }
+        )
+    insert(Venue.__table__, rows, batch)
+
+    rows = []
+    for _ in range(artists):
+        city, state = rng.choice(CITIES)
+        rows.append(
+            {
+                "name": name(rng, words=2),
+                "city": city,
+                "state": state,
+                "phone": "326-123-{:04d}".format(rng.randrange(10000)),
+                "genres": rng.sample(GENRES, rng.randint(1, 3)),
+                "image_link": "https://example.com/a/{}.jpg".format(len(rows)),
+                "seeking_venue": rng.random() < 0.3,
+            }
+        )
+    insert(Artist.__table__, rows, batch)
+
+    venue_ids = [id for (id,) in db.session.query(Venue.id).order_by(Venue.id)]
+    artist_ids = [id for (id,) in db.session.query(Artist.id).order_by(Artist.id)]
+    rng.shuffle(venue_ids)
+    rng.shuffle(artist_ids)
+    venue_weights = zipf_weights(len(venue_ids))
+    artist_weights = zipf_weights(len(artist_ids))
+
+    slots = list(range(SLOTS[0], SLOTS[1]))
+    per_slot, extra = divmod(shows, len(slots))
+    if per_slot + 1 > min(len(venue_ids), len(artist_ids)) // 2:
+        raise ValueError("too few venues or artists for {} shows".format(shows))
+    crowded = set(rng.sample(slots, extra))
+
+    rows = []
+    for slot in slots:
+        k = per_slot + (slot in crowded)
+        start_time = now + timedelta(hours=slot * SLOT_HOURS)
+        for venue_id, artist_id in zip(
+            distinct_choices(rng, venue_ids, venue_weights, k),
+            distinct_choices(rng, artist_ids, artist_weights, k),
+        ):
+            rows.append(
+                {
+                    "venue_id": venue_id,
+                    "artist_id": artist_id,
+                    "start_time": start_time,
+                    "end_time": start_time + DEFAULT_DURATION,
+                }
+            )
+        if len(rows) >= batch:
+            db.session.execute(Show.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Show.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shows", type=int, default=100000)
+    parser.add_argument("--venues", type=int, help="Default: shows / 100.")
+    parser.add_argument("--artists", type=int, help="Default: shows / 20.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    venues, artists = default_sizes(args.shows)
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        seed(args.venues or venues, args.artists or artists, args.shows, args.seed)
+        stats.rebuild(db.session)
+        db.session.commit()
+        print(
+            "Seeded {} venues, {} artists and {} shows in {:.1f}s".format(
+                args.venues or venues,
+                args.artists or artists,
+                args.shows,
+                time.perf_counter() - started,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
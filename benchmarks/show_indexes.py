@@ -0,0 +1,135 @@
+""" Compares Show query plans and timings without and with the Show indexes
+
+    $ DATABASE_URL=postgresql:///fayir_bench python -m benchmarks.show_indexes
+
+Run it against a scratch database: the Show indexes are dropped for the
+first pass and recreated for the second. An empty database is seeded first.
+"""
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from app import app, db, Show
+from benchmarks.seed import seed
+
+QUERIES = [
+    (
+        "venue upcoming shows",
+        'SELECT id, artist_id, start_time FROM "Show" '
+        "WHERE venue_id = :venue_id AND start_time >= :now ORDER BY start_time",
+    ),
+    (
+        "artist past shows",
+        'SELECT id, venue_id, start_time FROM "Show" '
+        "WHERE artist_id = :artist_id AND start_time < :now "
+        "ORDER BY start_time DESC LIMIT 50",
+    ),
+    (
+        "shows page",
+        'SELECT id, start_time FROM "Show" WHERE (start_time, id) > (:now, 0) '
+        "ORDER BY start_time, id LIMIT 20",
+    ),
+    (
+        "venue show counts",
+        'SELECT count(*) FROM "Show" WHERE venue_id = :venue_id',
+    ),
+]
+
+
+def statement(sql):
+    query = db.text(sql)
+    if ":now" in sql:
+        query = query.bindparams(db.bindparam("now", type_=db.DateTime))
+    return query
+
+
+def explain(sql, params):
+    """ Returns the query plan of sql as text """
+    if db.engine.dialect.name == "postgresql":
+        prefix = "EXPLAIN ANALYZE "
+    else:
+        prefix = "EXPLAIN QUERY PLAN "
+    rows = db.session.execute(statement(prefix + sql), params)
+    return "\n".join(" ".join(str(col) for col in row) for row in rows)
+
+
+def timing(sql, params, repeat):
+    """ Returns the median wall time of sql in milliseconds """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db.session.execute(statement(sql), params).fetchall()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def set_indexes(present):
+    for index in Show.__table__.indexes:
+        if present:
+            index.create(db.engine, checkfirst=True)
+        else:
+            index.drop(db.engine, checkfirst=True)
+    with db.engine.begin() as conn:
+        conn.execute(db.text('ANALYZE "Show"'))
+
+
+def busiest(column):
+    """ Returns the id with the most shows in column """
+    return (
+        db.session.query(column)
+        .group_by(column)
+        .order_by(db.func.count().desc())
+        .limit(1)
+        .scalar()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--venues", type=int, default=1000)
+    parser.add_argument("--artists", type=int, default=5000)
+    parser.add_argument("--shows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Show.id).first() is None:
+            print("Seeding {} shows...".format(args.shows))
+            seed(args.venues, args.artists, args.shows)
+        params = {
+            "venue_id": busiest(Show.venue_id),
+            "artist_id": busiest(Show.artist_id),
+            "now": datetime.today(),
+        }
+        db.session.commit()
+
+        results = {}
+        for present in (False, True):
+            set_indexes(present)
+            label = "with indexes" if present else "without indexes"
+            for name, sql in QUERIES:
+                print("== {} ({})".format(name, label))
+                print(explain(sql, params))
+                results[name, present] = timing(sql, params, args.repeat)
+            db.session.commit()
+
+        print()
+        print(
+            "{:<24}{:>14}{:>14}{:>10}".format(
+                "query", "without ms", "with ms", "speedup"
+            )
+        )
+        for name, _ in QUERIES:
+            without, with_ = results[name, False], results[name, True]
+            print(
+                "{:<24}{:>14.3f}{:>14.3f}{:>9.1f}x".format(
+                    name, without, with_, without / with_
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from sqlalchemy import DDL, DateTime, Integer, and_, cast, event, func, literal, or_
+from sqlalchemy import select, union_all
+
+# Length of a show whose end time is not given
+DEFAULT_DURATION = timedelta(hours=2)
+
+# Postgres names its exclusion constraints, and SQLite its triggers' errors,
+# after these so a violation reads the same on both
+CONSTRAINTS = {
+    "venue_id": "show_venue_no_overlap",
+    "artist_id": "show_artist_no_overlap",
+}
+MESSAGES = {
+    "show_venue_no_overlap": "The venue already has a show at that time.",
+    "show_artist_no_overlap": "The artist is already playing at that time.",
+}
+
+
+def default_end_time(context):
+    return context.get_current_parameters()["start_time"] + DEFAULT_DURATION
+
+
+def postgres_ddl(tablename):
+    """ Returns the statements adding the exclusion constraints, which keep
+    the time ranges of a venue's (or an artist's) shows from overlapping"""
+    return ["CREATE EXTENSION IF NOT EXISTS btree_gist"] + [
+        f'ALTER TABLE "{tablename}" ADD CONSTRAINT {name} EXCLUDE USING gist '
+        f"({column} WITH =, tsrange(start_time, end_time) WITH &&)"
+        for column, name in CONSTRAINTS.items()
+    ]
+
+
+def sqlite_ddl(tablename):
+    """ Returns the statements of the SQLite triggers doing the same checks
+
+    As a venue's (or an artist's) shows never overlap, the one starting last
+    before the new show ends is the only one that can overlap it, and finding
+    it is a single lookup in the (venue_id, start_time) index.
+    """
+    return [
+        f'CREATE TRIGGER "{name}_{action.lower()}" BEFORE {action} '
+        f'ON "{tablename}" '
+        f'WHEN (SELECT end_time FROM "{tablename}" WHERE {column} = NEW.{column} '
+        "AND start_time < NEW.end_time AND id IS NOT NEW.id "
+        "ORDER BY start_time DESC LIMIT 1) > NEW.start_time "
+        f"BEGIN SELECT RAISE(ABORT, '{name}'); END"
+        for column, name in CONSTRAINTS.items()
+        for action in ("INSERT", "UPDATE")
+    ]
+
+
+def install(model):
+    """ Adds the double-booking checks of the show model to its table """
+    for statement in postgres_ddl(model.__tablename__):
+        event.listen(
+            model.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect="postgresql"),
+        )
+    for statement in sqlite_ddl(model.__tablename__):
+        event.listen(
+            model.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect="sqlite"),
+        )
+
+
+def conflict_message(error):
+    """ Returns the message of the double-booking an IntegrityError is about,
+    or None if it is about something else"""
+    for name, message in MESSAGES.items():
+        if name in str(error.orig):
+            return message
+    return None
+
+
+def overlapping(dialect, show, start, end):
+    """ Returns a criterion selecting shows overlapping [start, end)
+
+    On Postgres it is written as a range overlap so the GiST index of the
+    exclusion constraints serves it.
+    """
+    if dialect == "postgresql":
+        return func.tsrange(show.start_time, show.end_time).op("&&")(
+            func.tsrange(start, end)
+        )
+    return and_(show.end_time > start, show.start_time < end)
+
+
+def find_conflicts(session, show, slots):
+    """ Returns the shows clashing with each slot, in one query
+
+    slots is a list of dicts with start_time, end_time and a venue_id, an
+    artist_id or both. The result has a (venue conflicts, artist conflicts)
+    pair of show id lists per slot.
+    """
+    dialect = session.get_bind().dialect.name
+    rows = union_all(
+        *[
+            select(
+                cast(literal(number), Integer).label("number"),
+                cast(literal(slot.get("venue_id")), Integer).label("venue_id"),
+                cast(literal(slot.get("artist_id")), Integer).label("artist_id"),
+                # no CAST: SQLite would turn the datetime text into a number
+                literal(slot["start_time"], DateTime).label("start_time"),
+                literal(slot["end_time"], DateTime).label("end_time"),
+            )
+            for number, slot in enumerate(slots)
+        ]
+    ).subquery("slots")
+    query = (
+        select(
+            rows.c.number,
+            rows.c.venue_id,
+            rows.c.artist_id,
+            show.id.label("show_id"),
+            show.venue_id.label("show_venue_id"),
+            show.artist_id.label("show_artist_id"),
+        )
+        .select_from(rows)
+        .join(
+            show,
+            and_(
+                or_(
+                    show.venue_id == rows.c.venue_id,
+                    show.artist_id == rows.c.artist_id,
+                ),
+                overlapping(dialect, show, rows.c.start_time, rows.c.end_time),
+            ),
+        )
+        .order_by(rows.c.number, show.start_time)
+    )
+    conflicts = [([], []) for _ in slots]
+    for row in session.execute(query):
+        venue_conflicts, artist_conflicts = conflicts[row.number]
+        if row.show_venue_id == row.venue_id:
+            venue_conflicts.append(row.show_id)
+        if row.show_artist_id == row.artist_id:
+            artist_conflicts.append(row.show_id)
+    return conflicts
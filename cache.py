@@ -0,0 +1,274 @@
+import functools
+import json
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from flask import current_app, g, request, session
+
+from routing import STICKY_COOKIE
+
+
+class LRUBackend:
+    """ In-process cache holding at most max_entries values """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+class SocketBackend:
+    """ Cache shared between workers through a Redis-compatible server
+
+    url is redis://host:port or unix:///path/to/socket. Only GET, SET and
+    DEL are used, so any server speaking that subset of RESP will do.
+    Connection errors are treated as misses so the site keeps serving.
+    """
+
+    def __init__(self, url, timeout=0.25):
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.evictions = None
+
+    def connect(self):
+        if self.url.scheme == "unix":
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.settimeout(self.timeout)
+            conn.connect(self.url.path)
+        else:
+            conn = socket.create_connection(
+                (self.url.hostname or "localhost", self.url.port or 6379),
+                self.timeout,
+            )
+        return conn, conn.makefile("rb")
+
+    def command(self, *args):
+        if getattr(self.local, "conn", None) is None:
+            self.local.conn = self.connect()
+        conn, reader = self.local.conn
+        payload = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            payload.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        try:
+            conn.sendall(b"".join(payload))
+            return self.reply(reader)
+        except OSError:
+            self.local.conn = None
+            conn.close()
+            raise
+
+    def reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise ConnectionError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            if int(rest) < 0:
+                return None
+            data = reader.read(int(rest) + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [self.reply(reader) for _ in range(max(int(rest), 0))]
+        raise ConnectionError("unexpected cache reply {!r}".format(line))
+
+    def get(self, key):
+        try:
+            return self.command("GET", key)
+        except OSError:
+            return None
+
+    def set(self, key, value, timeout=None):
+        try:
+            if timeout:
+                self.command("SET", key, value, "EX", int(timeout))
+            else:
+                self.command("SET", key, value)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        try:
+            self.command("DEL", key)
+        except OSError:
+            pass
+
+
+def new_token(invalidated_at):
+    """ Returns a generation token: the time its scope was invalidated, in
+    milliseconds since the epoch, and a random part"""
+    return "{}.{}".format(int(invalidated_at * 1000), uuid.uuid4().hex[:16]).encode()
+
+
+def invalidated_at(token):
+    """ Returns the time in a generation token, 0 if there is none """
+    stamp, dot, _ = token.partition(".")
+    return int(stamp) / 1000 if dot and stamp.isdigit() else 0
+
+
+class PageCache:
+    """ Read-through cache of rendered GET responses
+
+    Every cached page belongs to scopes such as "venue:5" or "shows". A scope
+    has a generation token stored in the backend and part of the page key,
+    so invalidating a scope drops every page in it (including each paginated
+    variant) by replacing one token, and the old entries age out.
+
+    A replica may not have the write behind an invalidation yet, so for
+    REPLICA_STICKY_SECONDS after it only pages read from the primary are
+    cached, and clients with the sticky cookie never get a page rendered
+    before their write.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.timeout = app.config.get("CACHE_TIMEOUT")
+        self.replica_lag = app.config.get("REPLICA_STICKY_SECONDS", 0)
+        kind = app.config.get("CACHE_BACKEND")
+        if kind == "lru":
+            self.backend = LRUBackend(app.config.get("CACHE_MAX_ENTRIES", 1024))
+        elif kind == "socket":
+            self.backend = SocketBackend(app.config["CACHE_URL"])
+        elif kind:
+            raise ValueError("Unknown CACHE_BACKEND {!r}".format(kind))
+        app.extensions["page_cache"] = self
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def generation(self, scope):
+        key = "gen:" + scope
+        token = self.backend.get(key)
+        if token is None:
+            token = new_token(0)
+            self.backend.set(key, token)
+        return token.decode() if isinstance(token, bytes) else token
+
+    def storable(self, tokens):
+        """ Returns whether a value computed by this request may be cached
+        under tokens: not if it was read from a replica that may still miss
+        the write behind one of them"""
+        if not g.get("replica_read"):
+            return True
+        newest = max((invalidated_at(token) for token in tokens), default=0)
+        return time.time() - newest >= self.replica_lag
+
+    def cached(self, *scopes):
+        """ Caches the view's response under scopes formatted with its kwargs """
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # Pages carrying flashed messages belong to a single visitor,
+                # and a client that just wrote reads its change from the primary.
+                if (
+                    self.backend is None
+                    or "_flashes" in session
+                    or STICKY_COOKIE in request.cookies
+                ):
+                    return view(**kwargs)
+
+                tokens = [self.generation(s.format(**kwargs)) for s in scopes]
+                key = "page:{}:{}".format(request.full_path, ":".join(tokens))
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.count("hits")
+                    mimetype, _, body = entry.partition(b"\n")
+                    return current_app.response_class(body, mimetype=mimetype.decode())
+
+                self.count("misses")
+                response = current_app.make_response(view(**kwargs))
+                if (
+                    response.status_code == 200
+                    and not response.direct_passthrough
+                    and self.storable(tokens)
+                ):
+                    entry = response.mimetype.encode() + b"\n" + response.get_data()
+                    self.backend.set(key, entry, self.timeout)
+                return response
+
+            return wrapper
+
+        return decorator
+
+    def memoize(self, key, scopes, compute):
+        """ Returns the JSON value cached under key in scopes, or computes,
+        caches and returns it """
+        if self.backend is None:
+            return compute()
+        tokens = [self.generation(scope) for scope in scopes]
+        key = "memo:{}:{}".format(key, ":".join(tokens))
+        entry = self.backend.get(key)
+        if entry is not None:
+            self.count("hits")
+            return json.loads(entry)
+
+        self.count("misses")
+        value = compute()
+        if self.storable(tokens):
+            self.backend.set(key, json.dumps(value).encode(), self.timeout)
+        return value
+
+    def invalidate(self, *scopes):
+        """ Drops every cached page in the given scopes """
+        if self.backend is None:
+            return
+        for scope in scopes:
+            self.backend.set("gen:" + scope, new_token(time.time()))
+            self.count("invalidations")
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": getattr(self.backend, "evictions", None),
+            "invalidations": self.invalidations,
+        }
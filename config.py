@@ -1,12 +1,195 @@
 import os
-SECRET_KEY = os.urandom(32)
+
+
+def secret_keys():
+    """ Returns the secret key and the old keys still accepted, newest first
+
+    They are read from the file at SECRET_KEY_FILE, one per line, or else
+    from SECRET_KEY and the comma separated SECRET_KEY_FALLBACKS.
+    """
+    path = os.environ.get("SECRET_KEY_FILE")
+    if path:
+        with open(path) as lines:
+            keys = [line.strip() for line in lines]
+    else:
+        keys = [os.environ.get("SECRET_KEY", "")]
+        keys += os.environ.get("SECRET_KEY_FALLBACKS", "").split(",")
+    keys = [key for key in keys if key]
+    return (keys[0] if keys else None), keys[1:]
+
+
+# Signs the session cookie, so every worker must have the same one. To rotate
+# it, put the new key first and keep the old one as a fallback until the
+# sessions signed with it have expired (PERMANENT_SESSION_LIFETIME).
+SECRET_KEY, SECRET_KEY_FALLBACKS = secret_keys()
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
-
 # Connect to the database
 
-SQLALCHEMY_DATABASE_URI = # '<Put your local database url>'
+SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL")  # '<Put your local database url>'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# Passed to create_engine; the profiles below set the pool up
+SQLALCHEMY_ENGINE_OPTIONS = {}
+# Read replicas of the database, from the comma separated URLs in
+# DATABASE_REPLICA_URLS. GET and HEAD requests read from one of them, except
+# for REPLICA_STICKY_SECONDS after the client's last write.
+SQLALCHEMY_BINDS = {
+    "replica{}".format(number): url
+    for number, url in enumerate(
+        filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(",")), 1
+    )
+}
+REPLICA_STICKY_SECONDS = 10
+
+# Keyset pagination of the list and search pages
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Most recent past shows listed on a venue or artist page
+PAST_SHOWS_LIMIT = 50
+
+# Rendered page cache: "lru" keeps pages in each process, "socket" shares them
+# through the Redis-compatible server at CACHE_URL, None disables caching.
+# "lru" only suits a single process: invalidations reach no other worker, nor
+# the server from CLI commands
+CACHE_BACKEND = "lru"
+CACHE_URL = os.environ.get("CACHE_URL", "redis://localhost:6379")
+CACHE_MAX_ENTRIES = 1024
+CACHE_TIMEOUT = 300
+
+# Sessions (flash messages, CSRF tokens) live in the signed session cookie,
+# unless SESSION_BACKEND is "socket": then the cookie only carries a signed id
+# and the data is kept by the Redis-compatible server at SESSION_URL, shared
+# by every worker. "lru" keeps them in the process, for the development server.
+SESSION_BACKEND = None
+SESSION_URL = os.environ.get("SESSION_URL", CACHE_URL)
+
+# Bulk import: rows per INSERT, and the bearer token of the upload endpoint
+IMPORT_BATCH_SIZE = 1000
+IMPORT_TOKEN = os.environ.get("IMPORT_TOKEN")
+
+# Bulk export: rows fetched per server-side cursor round trip, and the bearer
+# token of the download endpoint
+EXPORT_BATCH_SIZE = 1000
+EXPORT_TOKEN = os.environ.get("EXPORT_TOKEN")
+# An incremental export also repeats the rows updated this long before its
+# since, so it must exceed the longest write transaction: updated_at is when
+# a transaction started, not when it committed
+EXPORT_OVERLAP_SECONDS = 300
+
+# Deleting a venue or artist with more shows than this returns at once and
+# deletes the shows in the background, DELETE_BATCH_SIZE per transaction
+DELETE_BATCH_THRESHOLD = 5000
+DELETE_BATCH_SIZE = 1000
+
+# Matchmaking: rows read from each candidate pool before scoring
+MATCH_CANDIDATES = 500
+
+# Most candidate slots checked by one availability request (SQLite caps a
+# compound SELECT at 500 terms)
+MAX_AVAILABILITY_SLOTS = 500
+
+# Calendar feed: longest time window, and rows fetched per round trip
+CALENDAR_MAX_DAYS = 366
+CALENDAR_BATCH_SIZE = 1000
+
+# Request instrumentation: each response gets a Server-Timing header with its
+# SQL, rendering and total time, unless SERVER_TIMING is off. /metrics serves
+# per-route histograms of them to Prometheus, to METRICS_TOKEN bearers, or
+# to anyone with METRICS_PUBLIC and no token set, as does /cache/stats with
+# the page cache counters. Processes count on their own; given a METRICS_DIR
+# they share their numbers there, and /metrics adds up those of every worker.
+# Requests slower than SLOW_REQUEST_SECONDS are logged with their
+# SLOW_REQUEST_STATEMENTS most time consuming statements.
+SERVER_TIMING = True
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+METRICS_PUBLIC = False
+METRICS_DIR = os.environ.get("METRICS_DIR")
+SLOW_REQUEST_SECONDS = 1.0
+SLOW_REQUEST_STATEMENTS = 10
+
+# Sampling profiler, off unless PROFILE_DIR is set. Requests carrying a token
+# from `flask profile-token` (valid PROFILE_TOKEN_MAX_AGE seconds) in the
+# X-Profile header or the profile argument are profiled, plus a
+# PROFILE_SAMPLE_RATE fraction of all requests. Their stacks are sampled
+# every PROFILE_INTERVAL seconds, and the newest PROFILE_KEEP profiles kept.
+PROFILE_DIR = os.environ.get("PROFILE_DIR")
+PROFILE_TOKEN_MAX_AGE = 3600
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_INTERVAL = 0.005
+PROFILE_KEEP = 200
+
+# Logging: the app's records go as JSON lines through a queue to a background
+# thread writing them to LOG_FILE ("-" for stderr, None for Flask's default
+# handler), rotated at LOG_MAX_BYTES, or at LOG_ROTATE_WHEN (e.g. "midnight")
+# if set, keeping LOG_BACKUP_COUNT old files. Past LOG_QUEUE_SIZE records
+# waiting, new ones are dropped, and a message logged again from the same
+# place within LOG_DUPLICATE_SECONDS is only counted.
+LOG_FILE = "error.log"
+LOG_LEVEL = "INFO"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_WHEN = None
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+LOG_DUPLICATE_SECONDS = 60
+
+# Static files: `flask assets build` bundles, minifies, fingerprints and
+# precompresses them into static/dist. With ASSETS_HASHED on and a build
+# there, url_for("static") and asset_urls() point at the fingerprinted files,
+# which are cached by browsers for ASSETS_MAX_AGE seconds without revalidation.
+ASSETS_HASHED = True
+ASSETS_MAX_AGE = 365 * 24 * 3600
+
+
+# Profiles: FAYIR_CONFIG picks one, whose settings override the ones above.
+# Any setting can then be overridden by a FAYIR_ prefixed environment variable
+# holding JSON, e.g. FAYIR_PAGE_SIZE=50 or, for a key of a dict setting,
+# FAYIR_SQLALCHEMY_ENGINE_OPTIONS__pool_size=20.
+
+
+class Development:
+    DEBUG = True
+    LOG_FILE = None
+    # Edited static files show up without a rebuild
+    ASSETS_HASHED = False
+    METRICS_PUBLIC = True
+    # A key of its own per run when none is set
+    SECRET_KEY = SECRET_KEY or os.urandom(32)
+
+
+class Production:
+    DEBUG = False
+    # Workers would each rotate a shared file on their own, so log to stderr
+    # for the process manager to collect
+    LOG_FILE = "-"
+    # Each worker process has its own pool: keep workers * (pool_size +
+    # max_overflow) under the database's max_connections, and pool_size at
+    # least the threads per worker. pool_pre_ping replaces connections the
+    # server dropped, pool_recycle those idle firewalls would cut.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": 10,
+        "max_overflow": 5,
+        "pool_timeout": 10,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    }
+    # Workers and CLI commands must see each other's invalidations, which an
+    # in-process cache never does: share it through CACHE_URL, or cache nothing
+    CACHE_BACKEND = "socket" if os.environ.get("CACHE_URL") else None
+
+
+class Testing:
+    TESTING = True
+    SECRET_KEY = SECRET_KEY or os.urandom(32)
+    WTF_CSRF_ENABLED = False
+    CACHE_BACKEND = None
+    METRICS_PUBLIC = True
+    LOG_FILE = None
+
+
+PROFILES = {
+    "development": Development,
+    "production": Production,
+    "testing": Testing,
+}
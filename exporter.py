@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+FORMATS = ("jsonl", "csv")
+MIMETYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+
+def plain(value):
+    """ Returns value as a JSON and CSV friendly scalar or list """
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def serialize(rows, fields, fmt, chunk_size=500):
+    """ Yields rows as CSV or JSON Lines text, a chunk of rows at a time
+
+    CSV joins list values with commas, the way the importer splits them, so
+    an export can be loaded back with `flask import`.
+    """
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+    count = 0
+    for row in rows:
+        values = [plain(getattr(row, field)) for field in fields]
+        if fmt == "csv":
+            writer.writerow([",".join(v) if isinstance(v, list) else v for v in values])
+        else:
+            buffer.write(json.dumps(dict(zip(fields, values))))
+            buffer.write("\n")
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
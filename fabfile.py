@@ -4,11 +4,16 @@ from fabric.contrib.console import confirm
 # prepare for deployment
 
 
-def test():
-    with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+def test(baseline=None):
+    # Benchmarks every route against the scratch database in DATABASE_URL
+    # (see benchmarks.seed); fab test:before.json also fails on regressions
+    command = "python -m benchmarks.routes -o benchmark.json"
+    if baseline:
+        command += " && python -m benchmarks.routes --compare {} benchmark.json".format(
+            baseline
         )
+    with settings(warn_only=True):
+        result = local(command, capture=True)
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
@@ -39,9 +44,8 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    # Only checks the app loads: the benchmarks write, never run them there
+    local("heroku run flask --app wsgi routes")
 
 
 def deploy():
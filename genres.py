@@ -0,0 +1,103 @@
+import enum
+
+from flask import abort, request
+from sqlalchemy import String, cast, exists, func, select, true
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from search import dialect_of
+
+
+class Genre(enum.Enum):
+    """ The genres a venue or artist can be tagged with """
+
+    ALTERNATIVE = "Alternative"
+    BLUES = "Blues"
+    CLASSICAL = "Classical"
+    COUNTRY = "Country"
+    ELECTRONIC = "Electronic"
+    FOLK = "Folk"
+    FUNK = "Funk"
+    HIP_HOP = "Hip-Hop"
+    HEAVY_METAL = "Heavy Metal"
+    INSTRUMENTAL = "Instrumental"
+    JAZZ = "Jazz"
+    MUSICAL_THEATRE = "Musical Theatre"
+    POP = "Pop"
+    PUNK = "Punk"
+    R_AND_B = "R&B"
+    REGGAE = "Reggae"
+    ROCK_N_ROLL = "Rock n Roll"
+    SOUL = "Soul"
+    OTHER = "Other"
+
+
+GENRES = [genre.value for genre in Genre]
+GENRE_CHOICES = [(genre, genre) for genre in GENRES]
+
+
+def requested_genres():
+    """ Returns the genres the request filters by, aborting on unknown ones """
+    genres = request.values.getlist("genre")
+    unknown = [genre for genre in genres if genre not in GENRES]
+    if unknown:
+        abort(400, "Unknown genre: {}".format(", ".join(unknown)))
+    return genres
+
+
+def genre_table(dialect, column):
+    """ Returns a table valued function with a row per genre in column """
+    if dialect == "postgresql":
+        return func.unnest(column).table_valued("value").render_derived()
+    return func.json_each(column).table_valued("value")
+
+
+def genre_filter(query, column, genres):
+    """ Returns a criterion selecting rows having any of genres in column
+
+    On Postgres this is the array overlap operator, served by the GIN index
+    on column. SQLite stores the arrays as JSON and scans them with json_each.
+    """
+    dialect = dialect_of(query)
+    if dialect == "postgresql":
+        return column.overlap(cast(genres, ARRAY(String(30))))
+    values = genre_table(dialect, column)
+    return exists(select(values.c.value).where(values.c.value.in_(genres)))
+
+
+def filter_genres(query, column, genres):
+    """ Returns query narrowed to rows having any of genres, if any given """
+    if not genres:
+        return query
+    return query.filter(genre_filter(query, column, genres))
+
+
+def genre_counts(query, column):
+    """ Returns [genre, number of rows of query tagged with it] pairs, most
+    common first"""
+    rows = query.order_by(None).with_entities(column.label("genres")).subquery()
+    values = genre_table(dialect_of(query), rows.c.genres)
+    count = func.count().label("count")
+    counts = query.session.execute(
+        select(values.c.value, count)
+        .select_from(rows.join(values, true()))
+        .group_by(values.c.value)
+        .order_by(count.desc(), values.c.value)
+    )
+    return [[genre, number] for genre, number in counts]
+
+
+def genre_facets(counts, selected=()):
+    """ Returns the facets of genre_counts, each with the genre selection its
+    link toggles to
+    """
+    return [
+        {
+            "genre": genre,
+            "count": number,
+            "selected": genre in selected,
+            "genres": [g for g in selected if g != genre]
+            if genre in selected
+            else [*selected, genre],
+        }
+        for genre, number in counts
+    ]
@@ -0,0 +1,61 @@
+""" Gunicorn settings, tunable through the environment
+
+WEB_CONCURRENCY worker processes each run GUNICORN_THREADS threads, so
+WEB_CONCURRENCY * GUNICORN_THREADS requests are served at once. Workers
+scale the CPU bound work (templates, serialization) past the GIL; threads
+cover the time spent waiting on the database. Keep GUNICORN_THREADS at most
+the pool_size of the engine, or threads queue for a connection.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+# Restarts workers now and then, spread out, to bound any slow leak
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 10000))
+max_requests_jitter = max_requests // 10
+# Imports the app once, before forking, so workers start fast and share memory
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    """ Refuses a page cache each worker would keep to itself, and drops the
+    metrics the workers of an earlier run shared"""
+    from app import app
+
+    if server.cfg.workers > 1 and app.config["CACHE_BACKEND"] == "lru":
+        raise RuntimeError(
+            'CACHE_BACKEND "lru" is per process, so workers would serve pages '
+            'other workers invalidated: use "socket" with CACHE_URL, or None'
+        )
+    app.extensions["request_metrics"].reset()
+
+
+def post_fork(server, worker):
+    """ Drops the connections the master may have opened before forking, to
+    the primary and the replicas, so no two processes share one, and starts
+    the worker's log writer"""
+    import logs
+    from app import app, db
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    logs.restart(app)
+
+
+def worker_exit(server, worker):
+    """ Writes out the log records still queued, and the worker's last
+    metrics"""
+    import logs
+    from app import app
+
+    logs.stop(app)
+    metrics = app.extensions["request_metrics"]
+    if metrics.directory:
+        metrics.write()
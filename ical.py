@@ -0,0 +1,69 @@
+from datetime import datetime, timezone
+
+PRODID = "-//FayIR//Shows//EN"
+# RFC 5545 lines are at most 75 octets, continuation lines start with a space
+LINE_OCTETS = 75
+
+
+def escape(text):
+    """ Returns text escaped for an iCalendar TEXT value """
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line):
+    """ Returns line folded to LINE_OCTETS, without splitting a character """
+    data = line.encode()
+    parts = []
+    while len(data) > LINE_OCTETS - (1 if parts else 0):
+        cut = LINE_OCTETS - (1 if parts else 0)
+        while data[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    parts.append(data)
+    return b"\r\n ".join(parts).decode() + "\r\n"
+
+
+def stamp(value):
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def event_lines(row, now):
+    location = (row.venue_name, row.address, row.city, row.state)
+    return [
+        "BEGIN:VEVENT",
+        "UID:show-{}@fayir".format(row.id),
+        "DTSTAMP:" + now,
+        "DTSTART:" + stamp(row.start_time),
+        "DTEND:" + stamp(row.end_time),
+        "SUMMARY:" + escape("{} at {}".format(row.artist_name, row.venue_name)),
+        "LOCATION:" + escape(", ".join(part for part in location if part)),
+        "END:VEVENT",
+    ]
+
+
+def serialize(rows, chunk_size=500):
+    """ Yields an iCalendar feed of show rows, a chunk of events at a time
+
+    Times are written as floating local times, the way shows store them.
+    """
+    now = stamp(datetime.now(timezone.utc)) + "Z"
+    chunk = [
+        "BEGIN:VCALENDAR\r\n",
+        "VERSION:2.0\r\n",
+        fold("PRODID:" + PRODID),
+        "CALSCALE:GREGORIAN\r\n",
+    ]
+    for count, row in enumerate(rows, 1):
+        chunk.extend(fold(line) for line in event_lines(row, now))
+        if count % chunk_size == 0:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("END:VCALENDAR\r\n")
+    yield "".join(chunk)
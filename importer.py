@@ -0,0 +1,204 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from sqlalchemy import Integer
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+from wtforms import BooleanField, SelectMultipleField
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "jsonl"}
+FALSE_VALUES = ("", "0", "n", "no", "false", "off")
+
+
+def guess_format(filename):
+    """ Returns the import format matching the extension of filename """
+    return FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def read_rows(stream, fmt):
+    """ Yields (line number, row) pairs from a CSV or JSON Lines text stream
+
+    A row that cannot be parsed is yielded as the ValueError describing it.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, e
+                continue
+            if not isinstance(row, dict):
+                row = ValueError("expected a JSON object")
+            yield number, row
+    else:
+        raise ValueError("Unknown import format {!r}".format(fmt))
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Importer:
+    """ Loads rows of one model in batches, validated by its form
+
+    references maps a prefix such as "artist" to the model a row points to.
+    A row may name it by `<prefix>_id` or by its natural key `<prefix>_name`,
+    and both are resolved with one query per batch. on_insert is called with
+    the column values of every committed batch.
+    """
+
+    def __init__(self, model, form_class, references=None, on_insert=None):
+        self.model = model
+        self.form_class = form_class
+        self.references = references or {}
+        self.on_insert = on_insert
+        self.columns = {
+            column.name: column
+            for column in model.__table__.columns
+            if column.name != "id"
+        }
+        self.fields = None
+
+    def formdata(self, row, fields):
+        data = MultiDict()
+        for name, field in fields.items():
+            value = row.get(name)
+            if value is None:
+                continue
+            if isinstance(field, SelectMultipleField):
+                if not isinstance(value, list):
+                    value = [v.strip() for v in str(value).split(",") if v.strip()]
+                for v in value:
+                    data.add(name, str(v))
+            elif isinstance(field, BooleanField):
+                if value is True or str(value).strip().lower() not in FALSE_VALUES:
+                    data.add(name, "y")
+            else:
+                data.add(name, str(value))
+        return data
+
+    def resolve(self, session, batch):
+        """ Replaces the references of every row by ids, or by an error """
+        for prefix, model in self.references.items():
+            id_key, name_key = prefix + "_id", prefix + "_name"
+            rows = [row for _, row in batch if not isinstance(row, Exception)]
+            ids = {str(row[id_key]) for row in rows if row.get(id_key)}
+            names = {
+                row[name_key]
+                for row in rows
+                if not row.get(id_key) and row.get(name_key)
+            }
+            known = {
+                str(id)
+                for (id,) in session.query(model.id).filter(
+                    model.id.in_([int(id) for id in ids if id.isdigit()])
+                )
+            }
+            by_name = {}
+            for name, id in session.query(model.name, model.id).filter(
+                model.name.in_(names)
+            ):
+                by_name.setdefault(name, []).append(id)
+
+            for number, (line, row) in enumerate(batch):
+                if isinstance(row, Exception):
+                    continue
+                if row.get(id_key):
+                    error = None if str(row[id_key]) in known else "unknown id"
+                elif row.get(name_key):
+                    matches = by_name.get(row[name_key], [])
+                    if len(matches) == 1:
+                        row = dict(row, **{id_key: str(matches[0])})
+                        error = None
+                    else:
+                        error = "ambiguous name" if matches else "unknown name"
+                else:
+                    error = "missing {} or {}".format(id_key, name_key)
+                if error:
+                    row = ValueError({id_key: [error]})
+                batch[number] = (line, row)
+
+    def values(self, form):
+        """ Returns the column values of a validated form """
+        values = {}
+        for field in form:
+            column = self.columns.get(field.name)
+            if column is None:
+                continue
+            value = field.data
+            if value is None and column.default is not None:
+                continue
+            if isinstance(column.type, Integer) and isinstance(value, str):
+                value = int(value)
+            values[field.name] = value
+        return values
+
+    def load(self, session, batch, number):
+        """ Validates and inserts one batch, returning its report """
+        if self.fields is None:
+            form = self.form_class(meta={"csrf": False}, formdata=MultiDict())
+            self.fields = {field.name: field for field in form}
+        errors = []
+        values = []
+        self.resolve(session, batch)
+        for line, row in batch:
+            if isinstance(row, Exception):
+                detail = row.args[0] if row.args else str(row)
+                if not isinstance(detail, dict):
+                    detail = {"row": [str(detail)]}
+                errors.append({"line": line, "errors": detail})
+                continue
+            # A missing required field would otherwise fall back to its default
+            missing = {
+                name: ["This field is required."]
+                for name, field in self.fields.items()
+                if field.flags.required and row.get(name) in (None, "", [])
+            }
+            if missing:
+                errors.append({"line": line, "errors": missing})
+                continue
+            form = self.form_class(
+                meta={"csrf": False}, formdata=self.formdata(row, self.fields)
+            )
+            if not form.validate():
+                errors.append({"line": line, "errors": form.errors})
+                continue
+            values.append(self.values(form))
+
+        inserted = 0
+        if values:
+            try:
+                session.execute(self.model.__table__.insert().values(values))
+                session.commit()
+                inserted = len(values)
+            except SQLAlchemyError as e:
+                session.rollback()
+                errors.append(
+                    {
+                        "line": "{}-{}".format(batch[0][0], batch[-1][0]),
+                        "errors": {"batch": [str(getattr(e, "orig", e))]},
+                    }
+                )
+            else:
+                if self.on_insert is not None:
+                    self.on_insert(values)
+
+        return {"batch": number, "inserted": inserted, "errors": errors}
+
+    def run(self, session, stream, fmt, batch_size):
+        """ Yields a report per batch of rows read from stream """
+        for number, batch in enumerate(batches(read_rows(stream, fmt), batch_size), 1):
+            yield self.load(session, batch, number)
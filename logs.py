@@ -0,0 +1,200 @@
+import atexit
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+# Carries the request id in both directions, so a proxy's id is kept
+REQUEST_ID_HEADER = "X-Request-ID"
+REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Attributes of a record copied to its JSON object when set
+CONTEXT = ("request_id", "method", "path", "repeated", "dropped")
+
+
+class JSONFormatter(logging.Formatter):
+    """ Formats a record as a one line JSON object """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "pid": record.process,
+        }
+        for name in CONTEXT:
+            value = getattr(record, name, None)
+            if value:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestFilter(logging.Filter):
+    """ Adds the id, method and path of the current request to records """
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get("request_id")
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class DuplicateFilter(logging.Filter):
+    """ Lets through one record per interval seconds of each message, logged
+    from one place with one exception type
+
+    The first record let through after others were dropped carries their
+    number as repeated.
+    """
+
+    def __init__(self, interval, max_keys=1024):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        # key -> [time let through, records dropped since]
+        self.seen = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = (
+            record.name,
+            record.levelno,
+            record.pathname,
+            record.lineno,
+            record.getMessage(),
+            record.exc_info[0] if record.exc_info else None,
+        )
+        now = time.monotonic()
+        with self.lock:
+            entry = self.seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            if entry is None and len(self.seen) >= self.max_keys:
+                self.seen.clear()
+            self.seen[key] = [now, 0]
+        record.repeated = entry[1] if entry is not None else 0
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """ Queues records for a QueueListener, dropping them when the queue is
+    full rather than waiting
+
+    The next record queued carries the number dropped as dropped. The count
+    is kept under the handler's lock, which handle() holds already but a
+    direct emit() does not, and only reset once a record carrying it is
+    queued.
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        with self.lock:
+            if self.dropped:
+                record.dropped = self.dropped
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+            else:
+                self.dropped = 0
+
+
+def writer(config):
+    """ Returns the handler writing the log records, as configured """
+    path = config["LOG_FILE"]
+    if path == "-":
+        handler = logging.StreamHandler(sys.stderr)
+    elif config["LOG_ROTATE_WHEN"]:
+        handler = TimedRotatingFileHandler(
+            path, when=config["LOG_ROTATE_WHEN"], backupCount=config["LOG_BACKUP_COUNT"]
+        )
+    else:
+        handler = RotatingFileHandler(
+            path,
+            maxBytes=config["LOG_MAX_BYTES"],
+            backupCount=config["LOG_BACKUP_COUNT"],
+        )
+    # Records arrive formatted by the queue handler
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def listen(records, handlers):
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def init_app(app):
+    """ Tags requests with an id, and unless LOG_FILE is None sends the app's
+    log records as JSON lines through a queue to a background writer
+
+    Records are formatted by the thread logging them, only writing them out
+    is left to the background thread.
+    """
+
+    @app.before_request
+    def assign_request_id():
+        given = request.headers.get(REQUEST_ID_HEADER, "")
+        g.request_id = given if REQUEST_ID.match(given) else uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response):
+        if "request_id" in g:
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    if app.config["LOG_FILE"] is None:
+        return
+    records = queue.Queue(app.config["LOG_QUEUE_SIZE"])
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(RequestFilter())
+    handler.addFilter(DuplicateFilter(app.config["LOG_DUPLICATE_SECONDS"]))
+    handler.setFormatter(JSONFormatter())
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.logger.setLevel(app.config["LOG_LEVEL"])
+    app.extensions["logs"] = (handler, listen(records, [writer(app.config)]))
+    atexit.register(stop, app)
+
+
+def restart(app):
+    """ Starts a new writer thread in a forked process, which only inherits
+    the thread's object from its parent"""
+    if "logs" not in app.extensions:
+        return
+    handler, listener = app.extensions["logs"]
+    handler.queue = queue.Queue(app.config["LOG_QUEUE_SIZE"])
+    app.extensions["logs"] = (handler, listen(handler.queue, listener.handlers))
+
+
+def stop(app):
+    """ Writes out the queued records and stops the writer thread """
+    handler, listener = app.extensions.pop("logs", (None, None))
+    if listener is not None:
+        listener.stop()
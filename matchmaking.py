@@ -0,0 +1,115 @@
+from sqlalchemy import func, literal_column
+
+from genres import filter_genres
+from models import db, Artist, Venue, Show
+
+# How much each signal counts towards a score between 0 and 1
+WEIGHTS = {"genres": 0.5, "locality": 0.3, "history": 0.2}
+# Shows played together past which history stops adding to the score
+HISTORY_SATURATION = 5
+
+# For a venue: artists seeking venues, for an artist: venues seeking talent,
+# with the Show columns pointing at the entity and at the counterpart
+MATCHES = {
+    "venues": (Artist, Artist.seeking_venue, Show.venue_id, Show.artist_id),
+    "artists": (Venue, Venue.seeking_talent, Show.artist_id, Show.venue_id),
+}
+
+
+def seeking_criterion(seeking):
+    """ Returns the bare seeking column as a criterion, the predicate of the
+    partial seeking indexes: SQLAlchemy compares a boolean column to 1 on
+    SQLite, which then does not use them"""
+    return literal_column('"{}".{}'.format(seeking.table.name, seeking.name))
+
+
+def match_scopes(model, state, city, genres):
+    """ Returns the cache scopes of the matches a row of model in state and
+    city with genres can be a candidate of: one for its city, one per genre"""
+    name = model.__tablename__.lower()
+    return ["matches:{}:city:{}:{}".format(name, state, city)] + [
+        "matches:{}:genre:{}".format(name, genre) for genre in genres or ()
+    ]
+
+
+def candidates(entity, counterpart, seeking, history, limit):
+    """ Returns the rows of counterpart worth scoring for entity
+
+    They come from index-driven pools, each the first limit rows by id:
+    those in the same city and sharing a genre, those in the same city (the
+    partial seeking index), those sharing a genre (the GIN genres index) and
+    those that already shared a show with entity. The first pool holds the
+    best matches, which would not be among the first rows of a busy city or
+    a common genre.
+    """
+    base = db.session.query(
+        counterpart.id, counterpart.city, counterpart.state, counterpart.genres
+    ).filter(seeking_criterion(seeking))
+    local = base.filter(
+        counterpart.state == entity.state, counterpart.city == entity.city
+    )
+    pools = [local]
+    if entity.genres:
+        pools.insert(0, filter_genres(local, counterpart.genres, entity.genres))
+        pools.append(filter_genres(base, counterpart.genres, entity.genres))
+    if history:
+        pools.append(base.filter(counterpart.id.in_(list(history))))
+
+    rows = {}
+    for pool in pools:
+        for row in pool.order_by(counterpart.id).limit(limit):
+            rows[row.id] = row
+    return rows.values()
+
+
+def score(entity, row, shows):
+    """ Returns the match score of row for entity and what it is made of """
+    own, other = set(entity.genres or ()), set(row.genres or ())
+    genres = len(own & other) / len(own | other) if own | other else 0.0
+    if row.state == entity.state:
+        locality = 1.0 if row.city == entity.city else 0.5
+    else:
+        locality = 0.0
+    history = min(shows, HISTORY_SATURATION) / HISTORY_SATURATION
+    parts = {"genres": genres, "locality": locality, "history": history}
+    total = sum(WEIGHTS[name] * value for name, value in parts.items())
+    return round(total, 4), parts
+
+
+def recommend(kind, entity, limit, candidate_limit):
+    """ Returns up to limit counterparts seeking entity, the best match first """
+    counterpart, seeking, entity_column, counterpart_column = MATCHES[kind]
+    history = dict(
+        db.session.query(counterpart_column, func.count())
+        .filter(entity_column == entity.id)
+        .group_by(counterpart_column)
+    )
+    scored = []
+    for row in candidates(entity, counterpart, seeking, history, candidate_limit):
+        total, parts = score(entity, row, history.get(row.id, 0))
+        if total > 0:
+            scored.append((-total, row.id, row, parts))
+    scored.sort(key=lambda match: match[:2])
+    scored = scored[:limit]
+
+    # Only the matches returned need their names and images
+    details = {
+        row.id: row
+        for row in db.session.query(
+            counterpart.id, counterpart.name, counterpart.image_link
+        ).filter(counterpart.id.in_([id for _, id, _, _ in scored]))
+    }
+    return [
+        {
+            "id": row.id,
+            "name": details[row.id].name,
+            "city": row.city,
+            "state": row.state,
+            "genres": row.genres,
+            "image_link": details[row.id].image_link,
+            "score": -total,
+            "shows_together": history.get(row.id, 0),
+            "reasons": parts,
+        }
+        for total, _, row, parts in scored
+    ]
@@ -0,0 +1,346 @@
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from flask import g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+from models import db
+
+# Upper bounds of the histogram buckets
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# A process writes its numbers to METRICS_DIR this long after a request, once
+# for all the requests handled meanwhile
+WRITE_SECONDS = 1.0
+
+
+class Timing:
+    """ What one request spent, in seconds, and the statements it ran """
+
+    __slots__ = (
+        "start",
+        "queries",
+        "sql",
+        "render",
+        "statements",
+        "query_start",
+        "render_start",
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.render = 0.0
+        # statement -> [executions, seconds]
+        self.statements = {}
+        self.query_start = None
+        self.render_start = None
+
+    def slowest(self, limit):
+        """ Returns the (statement, executions, seconds) taking the longest """
+        rows = [
+            (sql, count, seconds) for sql, (count, seconds) in self.statements.items()
+        ]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+
+class Histogram:
+    """ Prometheus histogram with a series per combination of label values """
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket..., count over the last, sum]
+        self.series = {}
+
+    def observe(self, values, value):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * (len(self.buckets) + 1) + [0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def dump(self):
+        return [[list(values), series] for values, series in self.series.items()]
+
+    def merge(self, rows):
+        """ Adds the series of another process, as dumped """
+        for values, series in rows:
+            own = self.series.setdefault(tuple(values), [0] * len(series))
+            for index, value in enumerate(series):
+                own[index] += value
+
+    def lines(self):
+        yield "# HELP {} {}".format(self.name, self.help)
+        yield "# TYPE {} histogram".format(self.name)
+        for values, series in sorted(self.series.items()):
+            labels = label_pairs(self.labels, values)
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                total += count
+                yield '{}_bucket{{{},le="{}"}} {}'.format(
+                    self.name, labels, bound, total
+                )
+            yield "{}_sum{{{}}} {}".format(self.name, labels, round(series[-1], 6))
+            yield "{}_count{{{}}} {}".format(self.name, labels, total)
+
+
+class Counter:
+    """ Prometheus counter with a series per combination of label values """
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values):
+        self.series[values] = self.series.get(values, 0) + 1
+
+    def dump(self):
+        return [[list(values), count] for values, count in self.series.items()]
+
+    def merge(self, rows):
+        """ Adds the series of another process, as dumped """
+        for values, count in rows:
+            self.series[tuple(values)] = self.series.get(tuple(values), 0) + count
+
+    def lines(self):
+        yield "# HELP {} {}".format(self.name, self.help)
+        yield "# TYPE {} counter".format(self.name)
+        for values, count in sorted(self.series.items()):
+            yield "{}{{{}}} {}".format(
+                self.name, label_pairs(self.labels, values), count
+            )
+
+
+def new_metrics():
+    """ Returns the request counter and the histograms by what they measure """
+    labels = ("route", "method")
+    requests = Counter(
+        "fayir_requests_total", "Requests handled.", labels + ("status",)
+    )
+    histograms = {
+        "total": Histogram(
+            "fayir_request_duration_seconds",
+            "Time from routing to the response.",
+            labels,
+            SECONDS_BUCKETS,
+        ),
+        "sql": Histogram(
+            "fayir_request_sql_seconds",
+            "Time spent executing SQL statements.",
+            labels,
+            SECONDS_BUCKETS,
+        ),
+        "queries": Histogram(
+            "fayir_request_queries",
+            "SQL statements executed.",
+            labels,
+            QUERIES_BUCKETS,
+        ),
+        "render": Histogram(
+            "fayir_request_render_seconds",
+            "Time spent rendering templates.",
+            labels,
+            SECONDS_BUCKETS,
+        ),
+    }
+    return requests, histograms
+
+
+def label_pairs(names, values):
+    return ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"),
+        )
+        for name, value in zip(names, values)
+    )
+
+
+class RequestMetrics:
+    """ Times the queries, template rendering and handling of each request
+
+    The totals go out in a Server-Timing header and into per-route histograms
+    exposed in the Prometheus text format, and requests slower than
+    SLOW_REQUEST_SECONDS are logged with the statements they spent it on.
+    Streamed responses are timed until their body starts streaming.
+    Each process keeps its own numbers; with METRICS_DIR set, processes write
+    them there and /metrics adds up those of every process.
+    """
+
+    def __init__(self, app=None):
+        self.requests, self.histograms = new_metrics()
+        self.lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config.get("METRICS_DIR")
+        self.write_pending = False
+        self.process = None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self.before_query)
+            event.listen(engine, "after_cursor_execute", self.after_query)
+        before_render_template.connect(self.before_render, app)
+        template_rendered.connect(self.after_render, app)
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.extensions["request_metrics"] = self
+
+    def before_query(self, conn, cursor, statement, parameters, context, many):
+        if has_request_context() and "timing" in g:
+            g.timing.query_start = time.perf_counter()
+
+    def after_query(self, conn, cursor, statement, parameters, context, many):
+        timing = g.get("timing") if has_request_context() else None
+        if timing is None or timing.query_start is None:
+            return
+        elapsed = time.perf_counter() - timing.query_start
+        timing.query_start = None
+        timing.queries += 1
+        timing.sql += elapsed
+        entry = timing.statements.get(statement)
+        if entry is None:
+            timing.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def before_render(self, sender, template, context, **extra):
+        if "timing" in g:
+            g.timing.render_start = time.perf_counter()
+
+    def after_render(self, sender, template, context, **extra):
+        timing = g.get("timing")
+        if timing is not None and timing.render_start is not None:
+            timing.render += time.perf_counter() - timing.render_start
+            timing.render_start = None
+
+    def before_request(self):
+        g.timing = Timing()
+
+    def after_request(self, response):
+        timing = g.pop("timing", None)
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing.start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        values = (route, request.method)
+        with self.lock:
+            self.requests.inc(values + (response.status_code,))
+            self.histograms["total"].observe(values, total)
+            self.histograms["sql"].observe(values, timing.sql)
+            self.histograms["queries"].observe(values, timing.queries)
+            self.histograms["render"].observe(values, timing.render)
+            schedule = bool(self.directory) and not self.write_pending
+            if schedule:
+                self.write_pending = True
+        if schedule:
+            timer = threading.Timer(WRITE_SECONDS, self.write)
+            timer.daemon = True
+            timer.start()
+
+        config = self.app.config
+        if config["SERVER_TIMING"]:
+            response.headers["Server-Timing"] = (
+                'sql;dur={:.1f};desc="{} queries", render;dur={:.1f}, '
+                "total;dur={:.1f}".format(
+                    timing.sql * 1000,
+                    timing.queries,
+                    timing.render * 1000,
+                    total * 1000,
+                )
+            )
+        if total >= config["SLOW_REQUEST_SECONDS"]:
+            statements = "".join(
+                "\n  {:>5} x {:8.1f} ms  {}".format(
+                    count, seconds * 1000, " ".join(sql.split())
+                )
+                for sql, count, seconds in timing.slowest(
+                    config["SLOW_REQUEST_STATEMENTS"]
+                )
+            )
+            self.app.logger.warning(
+                "Slow request %s %s: %.0f ms, %d queries in %.0f ms, "
+                "rendering in %.0f ms%s",
+                request.method,
+                request.full_path.rstrip("?"),
+                total * 1000,
+                timing.queries,
+                timing.sql * 1000,
+                timing.render * 1000,
+                statements,
+            )
+        return response
+
+    def write(self):
+        """ Writes the numbers of this process to METRICS_DIR """
+        with self.lock:
+            data = {
+                metric.name: metric.dump()
+                for metric in [self.requests, *self.histograms.values()]
+            }
+            self.write_pending = False
+        if self.process != os.getpid():
+            # A file per process rather than per pid, as pids get reused
+            self.process = os.getpid()
+            self.path = os.path.join(
+                self.directory, "{}-{}.json".format(self.process, uuid.uuid4().hex[:8])
+            )
+        temporary = "{}.{}.tmp".format(self.path, threading.get_ident())
+        with open(temporary, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary, self.path)
+
+    def reset(self):
+        """ Removes the numbers earlier runs left in METRICS_DIR """
+        if not self.directory:
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith((".json", ".tmp")):
+                os.remove(os.path.join(self.directory, name))
+
+    def exposition(self):
+        """ Returns the metrics in the Prometheus text format """
+        if not self.directory:
+            with self.lock:
+                return render(self.requests, self.histograms)
+
+        # Processes that exited are still counted, so totals never go down
+        self.write()
+        requests, histograms = new_metrics()
+        metrics = {m.name: m for m in [requests, *histograms.values()]}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for metric, rows in data.items():
+                if metric in metrics:
+                    metrics[metric].merge(rows)
+        return render(requests, histograms)
+
+
+def render(requests, histograms):
+    lines = list(requests.lines())
+    for histogram in histograms.values():
+        lines.extend(histogram.lines())
+    return "\n".join(lines) + "\n"
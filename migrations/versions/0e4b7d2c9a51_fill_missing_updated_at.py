@@ -0,0 +1,31 @@
+"""fill missing updated_at
+
+Revision ID: 0e4b7d2c9a51
+Revises: 6c3e9a1f4b87
+Create Date: 2026-10-19 11:02:37.184920
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0e4b7d2c9a51'
+down_revision = '6c3e9a1f4b87'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # On SQLite, updated_at has no server default: the rows inserted before
+    # the models set it are NULL, and no export since a watermark finds them.
+    for table in TABLES:
+        op.execute(
+            'UPDATE "{}" SET updated_at = CURRENT_TIMESTAMP '
+            'WHERE updated_at IS NULL'.format(table)
+        )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,61 @@
+"""add name search indexes
+
+Revision ID: 3f9c2b7d1e4a
+Revises: 14aac022cc1f
+Create Date: 2026-10-17 19:10:41.518233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2b7d1e4a'
+down_revision = '14aac022cc1f'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def sqlite_fts(table):
+    fts = table + '_fts'
+    return [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f"name, content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        "VALUES ('delete', old.id, old.name); END",
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name ON "{table}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        "VALUES ('delete', old.id, old.name); "
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    ]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in TABLES:
+        op.create_index(
+            'ix_{}_name_trgm'.format(table.lower()),
+            table,
+            ['name'],
+            postgresql_using='gin',
+            postgresql_ops={'name': 'gin_trgm_ops'},
+        )
+        if dialect == 'sqlite':
+            for statement in sqlite_fts(table):
+                op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table in TABLES:
+        if dialect == 'sqlite':
+            op.execute('DROP TABLE IF EXISTS "{}_fts"'.format(table))
+        op.drop_index('ix_{}_name_trgm'.format(table.lower()), table_name=table)
@@ -0,0 +1,35 @@
+"""add pending deletes
+
+Revision ID: 6c3e9a1f4b87
+Revises: d2a7f5c8e314
+Create Date: 2026-10-18 09:40:18.615302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c3e9a1f4b87'
+down_revision = 'd2a7f5c8e314'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'PendingDelete',
+        sa.Column('kind', sa.String(length=10), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column(
+            'requested_at',
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('kind', 'entity_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('PendingDelete')
@@ -0,0 +1,41 @@
+"""add genre indexes
+
+Revision ID: 7d2f6b4e8c15
+Revises: e5a7c3d9f210
+Create Date: 2026-10-17 22:04:51.720336
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2f6b4e8c15'
+down_revision = 'e5a7c3d9f210'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    # GIN indexes serve the array overlap and containment operators
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.create_index(
+                'ix_{}_genres'.format(table.lower()),
+                table,
+                ['genres'],
+                postgresql_using='gin',
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.drop_index(
+                'ix_{}_genres'.format(table.lower()),
+                table_name=table,
+                postgresql_concurrently=True,
+            )
@@ -0,0 +1,36 @@
+"""add show indexes
+
+Revision ID: 8b1e5d0c7a26
+Revises: 3f9c2b7d1e4a
+Create Date: 2026-10-17 19:32:07.904415
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1e5d0c7a26'
+down_revision = '3f9c2b7d1e4a'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_show_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_show_start_time_id', ['start_time', 'id']),
+]
+
+
+def upgrade():
+    # CONCURRENTLY keeps the Show table writable on a live Postgres database
+    # but cannot run inside a transaction.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES:
+            op.create_index(name, 'Show', columns, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in INDEXES:
+            op.drop_index(name, table_name='Show', postgresql_concurrently=True)
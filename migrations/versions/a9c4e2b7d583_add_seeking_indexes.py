@@ -0,0 +1,41 @@
+"""add seeking indexes
+
+Revision ID: a9c4e2b7d583
+Revises: 7d2f6b4e8c15
+Create Date: 2026-10-17 22:41:17.093652
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2b7d583'
+down_revision = '7d2f6b4e8c15'
+branch_labels = None
+depends_on = None
+
+# Partial indexes of the venues and artists open to matchmaking
+INDEXES = [
+    ('ix_venue_seeking_state_city', 'Venue', 'seeking_talent'),
+    ('ix_artist_seeking_state_city', 'Artist', 'seeking_venue'),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, seeking in INDEXES:
+            op.create_index(
+                name,
+                table,
+                ['state', 'city'],
+                postgresql_where=sa.text(seeking),
+                sqlite_where=sa.text(seeking),
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
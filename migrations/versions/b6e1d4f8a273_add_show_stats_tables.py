@@ -0,0 +1,78 @@
+"""add show statistics tables
+
+Revision ID: b6e1d4f8a273
+Revises: f3b8d6a1c947
+Create Date: 2026-10-18 00:07:29.514830
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4f8a273'
+down_revision = 'f3b8d6a1c947'
+branch_labels = None
+depends_on = None
+
+# Statistics table, its key and the table it belongs to
+TABLES = [
+    ('VenueStats', 'venue_id', 'Venue'),
+    ('ArtistStats', 'artist_id', 'Artist'),
+]
+
+
+def upgrade():
+    now = datetime.today()
+    show = sa.table(
+        'Show',
+        sa.column('id', sa.Integer),
+        sa.column('venue_id', sa.Integer),
+        sa.column('artist_id', sa.Integer),
+        sa.column('start_time', sa.DateTime),
+    )
+    for name, key, parent in TABLES:
+        stats = op.create_table(
+            name,
+            sa.Column(key, sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+            sa.Column('past_shows_count', sa.Integer(), nullable=False),
+            sa.Column('next_show_time', sa.DateTime(), nullable=True),
+            sa.Column('last_show_time', sa.DateTime(), nullable=True),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint([key], [parent + '.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(key),
+        )
+        op.create_index(
+            op.f('ix_{}_next_show_time'.format(name)),
+            name,
+            ['next_show_time'],
+            unique=False,
+        )
+
+        # Same as `flask stats rebuild`
+        column = show.c[key]
+        upcoming = show.c.start_time >= now
+        op.execute(
+            stats.insert().from_select(
+                [c.name for c in stats.columns],
+                sa.select(
+                    column,
+                    sa.func.count(show.c.id).filter(upcoming),
+                    sa.func.count(show.c.id).filter(~upcoming),
+                    sa.func.min(show.c.start_time).filter(upcoming),
+                    sa.func.max(show.c.start_time).filter(~upcoming),
+                    sa.literal(now, sa.DateTime),
+                )
+                .where(column.isnot(None))
+                .group_by(column),
+            )
+        )
+
+
+def downgrade():
+    for name, _, _ in TABLES:
+        op.drop_index(op.f('ix_{}_next_show_time'.format(name)), table_name=name)
+        op.drop_table(name)
@@ -0,0 +1,48 @@
+"""add updated_at columns
+
+Revision ID: c4d8a1f3b962
+Revises: 8b1e5d0c7a26
+Create Date: 2026-10-17 20:14:52.301877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a1f3b962'
+down_revision = '8b1e5d0c7a26'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in TABLES:
+        if sqlite:
+            # SQLite cannot add a column with a non-constant default, and
+            # rebuilding the table would drop its search triggers: the models
+            # set updated_at on insert instead.
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+            op.execute('UPDATE "{}" SET updated_at = CURRENT_TIMESTAMP'.format(table))
+        else:
+            op.add_column(
+                table,
+                sa.Column(
+                    'updated_at',
+                    sa.DateTime(),
+                    server_default=sa.text('now()'),
+                    nullable=True,
+                ),
+            )
+        op.create_index(
+            'ix_{}_updated_at'.format(table), table, ['updated_at'], unique=False
+        )
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,37 @@
+"""add venue area index
+
+Revision ID: d2a7f5c8e314
+Revises: b6e1d4f8a273
+Create Date: 2026-10-18 09:12:44.208517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7f5c8e314'
+down_revision = 'b6e1d4f8a273'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keyset order of the venues list, NULLs read as '' as the query does
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_venue_area',
+            'Venue',
+            [
+                sa.text("coalesce(state, '')"),
+                sa.text("coalesce(city, '')"),
+                sa.text("coalesce(name, '')"),
+                'id',
+            ],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_venue_area', table_name='Venue', postgresql_concurrently=True)
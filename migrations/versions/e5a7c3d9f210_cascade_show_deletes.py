@@ -0,0 +1,43 @@
+"""cascade show deletes
+
+Revision ID: e5a7c3d9f210
+Revises: c4d8a1f3b962
+Create Date: 2026-10-17 21:36:08.514203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c3d9f210'
+down_revision = 'c4d8a1f3b962'
+branch_labels = None
+depends_on = None
+
+# The constraints were created unnamed; these are the names Postgres gave them
+# and, on SQLite, the names batch mode reflects them under.
+CONSTRAINTS = {
+    'artist_id': ('Artist', 'Show_artist_id_fkey'),
+    'venue_id': ('Venue', 'Show_venue_id_fkey'),
+}
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def replace_foreign_keys(ondelete):
+    with op.batch_alter_table(
+        'Show', naming_convention=NAMING_CONVENTION
+    ) as batch_op:
+        for column, (table, name) in CONSTRAINTS.items():
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, table, [column], ['id'], ondelete=ondelete
+            )
+
+
+def upgrade():
+    replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    replace_foreign_keys(None)
@@ -0,0 +1,80 @@
+"""add show end time and booking conflict checks
+
+Revision ID: f3b8d6a1c947
+Revises: a9c4e2b7d583
+Create Date: 2026-10-17 23:18:42.661409
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d6a1c947'
+down_revision = 'a9c4e2b7d583'
+branch_labels = None
+depends_on = None
+
+CONSTRAINTS = {
+    'venue_id': 'show_venue_no_overlap',
+    'artist_id': 'show_artist_no_overlap',
+}
+
+
+def sqlite_triggers():
+    # The last show starting before the new one ends is the only one that can
+    # overlap it, and a single lookup in the (venue_id, start_time) index.
+    for column, name in CONSTRAINTS.items():
+        for action in ('INSERT', 'UPDATE'):
+            yield (
+                f'CREATE TRIGGER "{name}_{action.lower()}" BEFORE {action} '
+                'ON "Show" '
+                f'WHEN (SELECT end_time FROM "Show" WHERE {column} = NEW.{column} '
+                'AND start_time < NEW.end_time AND id IS NOT NEW.id '
+                'ORDER BY start_time DESC LIMIT 1) > NEW.start_time '
+                f"BEGIN SELECT RAISE(ABORT, '{name}'); END"
+            )
+
+
+def upgrade():
+    # Existing shows are taken to last two hours. The constraints will not
+    # apply while shows overlap, which then have to be moved or removed first.
+    if op.get_bind().dialect.name == 'sqlite':
+        op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+        # Keeps the fractional seconds start_time is stored with
+        op.execute(
+            'UPDATE "Show" SET end_time = '
+            "strftime('%Y-%m-%d %H:%M:%S', start_time, '+2 hours') "
+            '|| substr(start_time, 20)'
+        )
+        # SQLite cannot alter a column: batch mode rebuilds the table, which
+        # has no triggers to lose until the ones below
+        with op.batch_alter_table('Show') as batch_op:
+            batch_op.alter_column('end_time', nullable=False)
+        for statement in sqlite_triggers():
+            op.execute(statement)
+        return
+
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute(
+        'UPDATE "Show" SET end_time = start_time + '
+        "interval '2 hours'"
+    )
+    op.alter_column('Show', 'end_time', nullable=False)
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for column, name in CONSTRAINTS.items():
+        op.execute(
+            f'ALTER TABLE "Show" ADD CONSTRAINT {name} EXCLUDE USING gist '
+            f'({column} WITH =, tsrange(start_time, end_time) WITH &&)'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        for name in CONSTRAINTS.values():
+            op.execute(f'DROP TRIGGER IF EXISTS "{name}_insert"')
+            op.execute(f'DROP TRIGGER IF EXISTS "{name}_update"')
+    else:
+        for name in CONSTRAINTS.values():
+            op.drop_constraint(name, 'Show')
+    op.drop_column('Show', 'end_time')
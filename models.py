@@ -0,0 +1,391 @@
+import sqlite3
+
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.engine import Engine
+
+import bookings
+import search
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """ Makes SQLite enforce foreign keys, ON DELETE CASCADE included """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# ----------------------------------------------------------------------------#
+# Models.
+# ----------------------------------------------------------------------------#
+
+# shows = db.Table(
+#     "Show",
+#     db.Column("artist_id", db.Integer, db.ForeignKey("Artist.id"), primary_key=True),
+#     db.Column("venue_id", db.Integer, db.ForeignKey("Venue.id"), primary_key=True),
+#     db.Column("start_time", db.DateTime),
+# )
+
+
+class Venue(db.Model):
+    __tablename__ = "Venue"
+    __table_args__ = (
+        db.Index(
+            "ix_venue_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        db.Index("ix_venue_genres", "genres", postgresql_using="gin"),
+        # Matchmaking candidates in the same city
+        db.Index(
+            "ix_venue_seeking_state_city",
+            "state",
+            "city",
+            postgresql_where=db.text("seeking_talent"),
+            sqlite_where=db.text("seeking_talent"),
+        ),
+        # Keyset order of the venues list, see VENUE_AREA_KEYS
+        db.Index(
+            "ix_venue_area",
+            db.text("coalesce(state, '')"),
+            db.text("coalesce(city, '')"),
+            db.text("coalesce(name, '')"),
+            "id",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(30)).with_variant(db.JSON, "sqlite"))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(500))
+    seeking_talent = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String())
+    # Also set on insert: SQLite databases migrated to it have no server default
+    updated_at = db.Column(
+        db.DateTime,
+        default=db.func.now(),
+        server_default=db.func.now(),
+        onupdate=db.func.now(),
+        index=True,
+    )
+
+    # The database deletes the shows through ON DELETE CASCADE
+    shows = db.relationship(
+        "Show",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        back_populates="venue",
+    )
+    stats = db.relationship("VenueStats", uselist=False, viewonly=True)
+
+    def to_dict(self):
+        """ Returns a dictinary of vevenuesnues """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "city": self.city,
+            "state": self.state,
+            "address": self.address,
+            "phone": self.phone,
+            "genres": self.genres,
+            "image_link": self.image_link,
+            "facebook_link": self.facebook_link,
+            "website": self.website,
+            "seeking_talent": self.seeking_talent,
+            "seeking_description": self.seeking_description,
+        }
+
+    def __repr__(self):
+        return f"<Venue {self.id} {self.name}>"
+
+
+def blank_if_null(column):
+    """ Returns column with NULL read as '', for a keyset key """
+    return db.func.coalesce(column, db.literal_column("''"))
+
+
+# Keyset keys of the venues list. A NULL compared in a row value makes the
+# comparison unknown, so a venue missing its state, city or name would fall
+# out of every page but the first, and its cursor would match no row.
+VENUE_AREA_KEYS = [
+    blank_if_null(Venue.state).label("area_state"),
+    blank_if_null(Venue.city).label("area_city"),
+    blank_if_null(Venue.name).label("area_name"),
+    Venue.id,
+]
+
+
+class Artist(db.Model):
+    __tablename__ = "Artist"
+    __table_args__ = (
+        db.Index(
+            "ix_artist_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+        db.Index("ix_artist_genres", "genres", postgresql_using="gin"),
+        # Matchmaking candidates in the same city
+        db.Index(
+            "ix_artist_seeking_state_city",
+            "state",
+            "city",
+            postgresql_where=db.text("seeking_venue"),
+            sqlite_where=db.text("seeking_venue"),
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(30)).with_variant(db.JSON, "sqlite"))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(500))
+    seeking_venue = db.Column(db.Boolean)
+    seeking_description = db.Column(db.String())
+    updated_at = db.Column(
+        db.DateTime,
+        default=db.func.now(),
+        server_default=db.func.now(),
+        onupdate=db.func.now(),
+        index=True,
+    )
+
+    # The database deletes the shows through ON DELETE CASCADE
+    shows = db.relationship(
+        "Show",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        back_populates="artist",
+    )
+    stats = db.relationship("ArtistStats", uselist=False, viewonly=True)
+
+    def to_dict(self):
+        """ Returns a dictinary of vevenuesnues """
+        return {
+            "id": self.id,
+            "name": self.name,
+            "city": self.city,
+            "state": self.state,
+            "phone": self.phone,
+            "genres": self.genres,
+            "image_link": self.image_link,
+            "facebook_link": self.facebook_link,
+            "website": self.website,
+            "seeking_venue": self.seeking_venue,
+            "seeking_description": self.seeking_description,
+        }
+
+
+class Show(db.Model):
+    __tablename__ = "Show"
+
+    id = db.Column(db.Integer, primary_key=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey("Artist.id", ondelete="CASCADE"))
+    venue_id = db.Column(db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"))
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, default=bookings.default_end_time)
+    updated_at = db.Column(
+        db.DateTime,
+        default=db.func.now(),
+        server_default=db.func.now(),
+        onupdate=db.func.now(),
+        index=True,
+    )
+
+    __table_args__ = (
+        db.Index("ix_show_venue_id_start_time", "venue_id", "start_time"),
+        db.Index("ix_show_artist_id_start_time", "artist_id", "start_time"),
+        db.Index("ix_show_start_time_id", "start_time", "id"),
+    )
+
+    venue = db.relationship("Venue", back_populates="shows", lazy="joined")
+    artist = db.relationship("Artist", back_populates="shows", lazy="joined")
+
+    def show_artist(self):
+        """ Returns a dictinary of artists for the show """
+        return {
+            "artist_id": self.artist_id,
+            "artist_name": self.artist.name,
+            "artist_image_link": self.artist.image_link,
+            "start_time": self.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def show_venue(self):
+        """ Returns a dictinary of venues for the show """
+        return {
+            "venue_id": self.venue_id,
+            "venue_name": self.venue.name,
+            "venue_image_link": self.venue.image_link,
+            "start_time": self.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class ShowStats:
+    """ Show counts and times of a venue or artist, split at refreshed_at
+
+    The rows are maintained by stats.py. An entity without shows has none.
+    """
+
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    next_show_time = db.Column(db.DateTime, index=True)
+    last_show_time = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+    def counts(self, now):
+        """ Returns the (past, upcoming) show counts at now, or None if a show
+        started since the row was refreshed and it is waiting to be rolled"""
+        if self.next_show_time is not None and self.next_show_time < now:
+            return None
+        return self.past_shows_count, self.upcoming_shows_count
+
+
+class VenueStats(ShowStats, db.Model):
+    __tablename__ = "VenueStats"
+
+    venue_id = db.Column(
+        db.Integer, db.ForeignKey("Venue.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
+class ArtistStats(ShowStats, db.Model):
+    __tablename__ = "ArtistStats"
+
+    artist_id = db.Column(
+        db.Integer, db.ForeignKey("Artist.id", ondelete="CASCADE"), primary_key=True
+    )
+
+
+class PendingDelete(db.Model):
+    """ A venue or artist whose shows are being deleted in batches
+
+    Recorded before the first batch and removed with the entity, so the
+    deletes a stopped process left part way can be finished.
+    """
+
+    __tablename__ = "PendingDelete"
+
+    kind = db.Column(db.String(10), primary_key=True)
+    entity_id = db.Column(db.Integer, primary_key=True)
+    requested_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+
+search.install(Venue)
+search.install(Artist)
+bookings.install(Show)
+
+
+# ----------------------------------------------------------------------------#
+# Queries.
+# ----------------------------------------------------------------------------#
+
+
+def shows_query():
+    """ Returns a query of show rows joined with their artist and venue """
+    return (
+        db.session.query(
+            Show.id,
+            Show.venue_id,
+            Venue.name.label("venue_name"),
+            Show.artist_id,
+            Artist.name.label("artist_name"),
+            Artist.image_link.label("artist_image_link"),
+            Show.start_time,
+        )
+        .join(Artist, Show.artist_id == Artist.id)
+        .join(Venue, Show.venue_id == Venue.id)
+    )
+
+
+def show_row_dict(row):
+    """ Returns a dictinary of a show row for the templates """
+    return dict(row._mapping)
+
+
+def split_shows(criterion, counterpart, counterpart_id, now, counts=None):
+    """ Returns past and upcoming shows matching criterion, split at now in SQL
+
+    Each show is joined with the id, name and image link of its counterpart
+    (Artist or Venue). Past shows are capped at PAST_SHOWS_LIMIT, most recent
+    first, while both counts stay exact. They are counted unless given as a
+    (past, upcoming) pair.
+    """
+    prefix = counterpart.__tablename__.lower()
+    rows = (
+        db.session.query(
+            counterpart_id.label(prefix + "_id"),
+            counterpart.name.label(prefix + "_name"),
+            counterpart.image_link.label(prefix + "_image_link"),
+            Show.start_time,
+        )
+        .join(counterpart, counterpart_id == counterpart.id)
+        .filter(criterion)
+    )
+    if counts is None:
+        counts = (
+            db.session.query(
+                db.func.count(Show.id).filter(Show.start_time < now),
+                db.func.count(Show.id).filter(Show.start_time >= now),
+            )
+            .filter(criterion)
+            .one()
+        )
+    past_count, upcoming_count = counts
+    past_shows = (
+        rows.filter(Show.start_time < now)
+        .order_by(Show.start_time.desc())
+        .limit(current_app.config["PAST_SHOWS_LIMIT"])
+    )
+    upcoming_shows = rows.filter(Show.start_time >= now).order_by(Show.start_time)
+
+    return {
+        "past_shows": [show_row_dict(row) for row in past_shows],
+        "upcoming_shows": [show_row_dict(row) for row in upcoming_shows],
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
+    }
+
+
+def streamed(query):
+    """ Yields the rows of query from the session of the context it is iterated
+    in, for responses wrapped in stream_with_context
+
+    Those are iterated after the view's app context was torn down, which
+    closed the session the query was built with. Iterating it would reopen
+    that session and check out a connection nothing returns to the pool.
+    """
+    yield from query.with_session(db.session())
+
+
+def delete_shows(criterion, batch_size):
+    """ Deletes the shows matching criterion batch_size rows at a time
+
+    Each batch is committed on its own, so no transaction holds row locks for
+    long and an interrupted run can simply be started again.
+    """
+    deleted = 0
+    while True:
+        batch = select(Show.id).where(criterion).limit(batch_size)
+        result = db.session.execute(Show.__table__.delete().where(Show.id.in_(batch)))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
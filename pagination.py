@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort, current_app, request
+from sqlalchemy import DateTime, tuple_
+
+# A page of rows plus the cursors of its neighbours (None when there is none)
+Page = namedtuple("Page", ["items", "next_cursor", "prev_cursor"])
+
+
+def encode_cursor(values):
+    """ Returns an opaque url-safe cursor for the sort key values of a row """
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keys):
+    """ Returns the sort key values stored in a cursor, or None if malformed """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(keys):
+            return None
+        return [
+            datetime.fromisoformat(v) if isinstance(key.type, DateTime) else v
+            for key, v in zip(keys, values)
+        ]
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def page_size():
+    """ Returns the requested page size clamped to the configured limits """
+    limit = request.args.get("limit", current_app.config["PAGE_SIZE"], type=int)
+    return max(1, min(limit, current_app.config["MAX_PAGE_SIZE"]))
+
+
+def paginate(query, keys):
+    """ Returns a keyset page of query ordered by keys
+
+    keys must identify a row uniquely. The page starts after the `after`
+    cursor or ends before the `before` cursor of the request, so every page
+    is a bounded index range scan no matter how deep it is.
+    """
+    limit = page_size()
+    after = request.args.get("after")
+    before = request.args.get("before")
+    cursor = before or after
+
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if values is None:
+            abort(400)
+        bound = tuple_(*values, types=[key.type for key in keys])
+        if before:
+            query = query.filter(tuple_(*keys) < bound)
+        else:
+            query = query.filter(tuple_(*keys) > bound)
+
+    order = [key.desc() for key in keys] if before else list(keys)
+    rows = query.order_by(*order).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([getattr(row, key.key) for key in keys])
+
+    if not rows:
+        return Page(rows, None, None)
+    if before:
+        return Page(rows, cursor_of(rows[-1]), cursor_of(rows[0]) if has_more else None)
+    return Page(
+        rows,
+        cursor_of(rows[-1]) if has_more else None,
+        cursor_of(rows[0]) if after else None,
+    )
@@ -0,0 +1,202 @@
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import after_this_request, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+# Profiles a request when it carries a token from `flask profile-token` in
+# this header or query argument
+HEADER = "X-Profile"
+ARGUMENT = "profile"
+# The views listing and serving profiles, never profiled themselves
+ENDPOINTS = ("profiles", "profile_file")
+# A sampler stops by itself after this long, should its request never close
+MAX_SECONDS = 60
+# Paths shortened to what follows them in stack frames
+ROOTS = tuple(
+    sorted(
+        {
+            os.path.dirname(os.path.abspath(__file__)) + os.sep,
+            sysconfig.get_paths()["purelib"] + os.sep,
+            sysconfig.get_paths()["stdlib"] + os.sep,
+        },
+        key=len,
+        reverse=True,
+    )
+)
+# Code object -> its frame label
+LABELS = {}
+
+
+def frame_label(code):
+    """ Returns the name a code object has in collapsed stacks """
+    label = LABELS.get(code)
+    if label is None:
+        path = code.co_filename
+        for root in ROOTS:
+            if path.startswith(root):
+                path = path[len(root) :]
+                break
+        label = LABELS[code] = "{} ({}:{})".format(
+            code.co_qualname, path, code.co_firstlineno
+        ).replace(";", ":")
+    return label
+
+
+def profile_name(created, method, path, elapsed):
+    """ Returns the file name of the profile of a request, which recent()
+    parses back"""
+    slug = re.sub(r"[^A-Za-z0-9.-]+", "-", path).strip("-")[:60] or "index"
+    return "{}_{}_{}_{}ms.collapsed".format(
+        created.strftime("%Y%m%dT%H%M%S%f"), method, slug, round(elapsed * 1000)
+    )
+
+
+class Sampler(threading.Thread):
+    """ Counts the stacks a thread is in, every interval seconds """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.started = time.perf_counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        deadline = time.monotonic() + MAX_SECONDS
+        while not self.stopped.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            self.samples[";".join(reversed(labels))] += 1
+
+    def stop(self):
+        """ Stops sampling, returns the seconds sampled """
+        self.stopped.set()
+        self.join()
+        return time.perf_counter() - self.started
+
+
+class Profiler:
+    """ Samples the Python stack of selected requests into files
+
+    A request is profiled when it carries a signed token, or at random with
+    probability PROFILE_SAMPLE_RATE. Its stacks are written to PROFILE_DIR in
+    the collapsed format that flamegraph.pl and speedscope read, until its
+    response is closed, so streamed bodies are included. Without PROFILE_DIR
+    nothing is hooked into the app.
+    """
+
+    salt = "profile"
+
+    def __init__(self, app=None):
+        self.directory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["profiler"] = self
+        self.directory = app.config.get("PROFILE_DIR")
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.rate = app.config["PROFILE_SAMPLE_RATE"]
+        self.interval = app.config["PROFILE_INTERVAL"]
+        self.keep = app.config["PROFILE_KEEP"]
+        app.before_request(self.start)
+
+    def serializer(self):
+        keys = list(self.app.config["SECRET_KEY_FALLBACKS"] or ())
+        return URLSafeTimedSerializer(keys + [self.app.secret_key], salt=self.salt)
+
+    def token(self):
+        return self.serializer().dumps(self.salt)
+
+    def request_token(self):
+        return request.headers.get(HEADER) or request.args.get(ARGUMENT)
+
+    def authorized(self):
+        """ Returns whether the request carries a valid token """
+        token = self.request_token()
+        if not token:
+            return False
+        try:
+            self.serializer().loads(
+                token, max_age=self.app.config["PROFILE_TOKEN_MAX_AGE"]
+            )
+        except BadSignature:
+            return False
+        return True
+
+    def start(self):
+        if request.endpoint in ENDPOINTS:
+            return
+        if not (self.rate and random.random() < self.rate) and not self.authorized():
+            return
+        sampler = Sampler(threading.get_ident(), self.interval)
+        sampler.start()
+        method, path = request.method, request.path
+
+        @after_this_request
+        def stop_on_close(response):
+            response.call_on_close(lambda: self.save(sampler, method, path))
+            return response
+
+    def save(self, sampler, method, path):
+        elapsed = sampler.stop()
+        name = profile_name(datetime.now(), method, path, elapsed)
+        with open(os.path.join(self.directory, name), "w") as output:
+            for stack, count in sampler.samples.items():
+                output.write("{} {}\n".format(stack, count))
+        for old in self.names()[self.keep :]:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except FileNotFoundError:
+                pass
+
+    def names(self):
+        """ Returns the profile file names, newest first """
+        names = [
+            name for name in os.listdir(self.directory) if name.endswith(".collapsed")
+        ]
+        return sorted(names, reverse=True)
+
+    def recent(self):
+        """ Returns the name, time, method, path slug and duration of each
+        profile, leaving out the files not named as save() names them"""
+        profiles = []
+        for name in self.names():
+            # The slug is whatever lies between the method and the duration
+            parts = name[: -len(".collapsed")].split("_", 2)
+            if len(parts) < 3 or "_" not in parts[2]:
+                continue
+            stamp, method, rest = parts
+            slug, duration = rest.rsplit("_", 1)
+            try:
+                created = datetime.strptime(stamp, "%Y%m%dT%H%M%S%f")
+                milliseconds = int(duration.removesuffix("ms"))
+            except ValueError:
+                continue
+            profiles.append(
+                {
+                    "name": name,
+                    "created": created,
+                    "method": method,
+                    "slug": slug,
+                    "duration": milliseconds,
+                }
+            )
+        return profiles
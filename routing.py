@@ -0,0 +1,73 @@
+import random
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Binds named replica1, replica2... are read replicas of the default bind
+REPLICA_PREFIX = "replica"
+# Requests that only read, and can be served by a replica
+SAFE_METHODS = ("GET", "HEAD")
+# Set on a client for REPLICA_STICKY_SECONDS after it wrote something, during
+# which its reads go to the primary, so it sees its own writes
+STICKY_COOKIE = "primary_reads"
+
+
+class RoutingSession(Session):
+    """ Session reading from a random replica during safe requests
+
+    Flushes, and everything outside of a safe request (other methods, CLI
+    commands, background threads), use the primary. A session sticks to the
+    replica it first picked, so a request sees one consistent snapshot.
+    """
+
+    def replica(self):
+        if "replica" not in self.info:
+            self.info["replica"] = None
+            if (
+                has_request_context()
+                and request.method in SAFE_METHODS
+                and STICKY_COOKIE not in request.cookies
+            ):
+                replicas = [
+                    engine
+                    for key, engine in self._db.engines.items()
+                    if key and key.startswith(REPLICA_PREFIX)
+                ]
+                if replicas:
+                    self.info["replica"] = random.choice(replicas)
+        return self.info["replica"]
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing:
+            replica = self.replica()
+            if replica is not None:
+                # Tells the page cache the response may lag behind the primary
+                g.replica_read = True
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def remember_write(session):
+    if has_request_context():
+        g.primary_write = True
+
+
+def init_app(app):
+    """ Makes clients that wrote read from the primary for a while after """
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get("primary_write") and any(
+            key and key.startswith(REPLICA_PREFIX)
+            for key in app.config["SQLALCHEMY_BINDS"]
+        ):
+            response.set_cookie(
+                STICKY_COOKIE,
+                "1",
+                max_age=app.config["REPLICA_STICKY_SECONDS"],
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
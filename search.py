@@ -0,0 +1,118 @@
+from sqlalchemy import DDL, Float, cast, column, event, literal, or_, select, table
+
+# Trigram matching needs at least this many characters to use an index
+MIN_INDEXED_TERM = 3
+
+
+def fts_table(model):
+    """ Returns the SQLite FTS5 shadow table indexing the names of model """
+    name = model.__tablename__ + "_fts"
+    return table(name, column("rowid"), column("name"), column("rank"), column(name))
+
+
+def fts_ddl(tablename):
+    """ Returns the SQLite statements creating and syncing a name FTS5 table """
+    fts = tablename + "_fts"
+    return [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f"name, content='{tablename}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{tablename}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{tablename}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        "VALUES ('delete', old.id, old.name); END",
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name ON "{tablename}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) '
+        "VALUES ('delete', old.id, old.name); "
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+    ]
+
+
+def install(model):
+    """ Creates the name search index of model alongside its table
+
+    Postgres gets the pg_trgm extension for the GIN trigram index declared on
+    the model, SQLite gets an FTS5 trigram table kept in sync by triggers.
+    """
+    tablename = model.__tablename__
+    event.listen(
+        model.__table__,
+        "before_create",
+        DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+    )
+    for statement in fts_ddl(tablename):
+        event.listen(
+            model.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect="sqlite"),
+        )
+    event.listen(
+        model.__table__,
+        "before_drop",
+        DDL(f'DROP TABLE IF EXISTS "{tablename}_fts"').execute_if(dialect="sqlite"),
+    )
+
+
+def like_pattern(term):
+    """ Returns a LIKE pattern matching term anywhere, with wildcards escaped """
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return "%{}%".format(escaped)
+
+
+def fts_phrase(term):
+    """ Returns term quoted as a single FTS5 phrase """
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+def dialect_of(query):
+    """ Returns the name of the database dialect query runs against """
+    return query.session.get_bind().dialect.name
+
+
+def name_matches(query, model, term):
+    """ Returns a criterion selecting rows of model whose name contains term """
+    if dialect_of(query) == "sqlite" and len(term) >= MIN_INDEXED_TERM:
+        fts = fts_table(model)
+        return model.id.in_(
+            select(fts.c.rowid).where(fts.c[fts.name].op("MATCH")(fts_phrase(term)))
+        )
+    return model.name.ilike(like_pattern(term), escape="\\")
+
+
+def search_names(query, model, term):
+    """ Returns query narrowed to rows of model whose name contains term, with
+    a `rank` column to order them by (lower is better) and its expression
+
+    Matching is case-insensitive and infix. On Postgres it is served by the
+    GIN trigram index on the name and ranked by trigram distance, on SQLite
+    by the FTS5 trigram table and ranked by bm25.
+    """
+    dialect = dialect_of(query)
+    if not term:
+        rank = literal(0.0, Float)
+    elif dialect == "sqlite" and len(term) >= MIN_INDEXED_TERM:
+        fts = fts_table(model)
+        query = query.join(fts, fts.c.rowid == model.id).filter(
+            fts.c[fts.name].op("MATCH")(fts_phrase(term))
+        )
+        rank = cast(fts.c.rank, Float)
+    else:
+        query = query.filter(name_matches(query, model, term))
+        if dialect == "postgresql":
+            rank = cast(model.name.op("<->")(term), Float)
+        else:
+            rank = literal(0.0, Float)
+
+    rank = rank.label("rank")
+    return query.add_columns(rank), rank
+
+
+def search_shows(query, artist, venue, term):
+    """ Returns a shows query narrowed to those whose artist or venue name
+    contains term
+    """
+    if not term:
+        return query
+    return query.filter(
+        or_(name_matches(query, artist, term), name_matches(query, venue, term))
+    )
@@ -0,0 +1,113 @@
+import secrets
+
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface
+from itsdangerous import BadSignature
+
+from cache import LRUBackend, SocketBackend
+
+
+class ServerSession(SecureCookieSession):
+    """ Session whose data is stored under sid by ServerSessionInterface """
+
+    def __init__(self, initial=None, sid=None):
+        super().__init__(initial)
+        self.sid = sid
+
+
+class ServerSessionInterface(SecureCookieSessionInterface):
+    """ Keeps session data in a cache backend, the cookie only carrying its id
+
+    The id is signed like the cookie sessions are, so SECRET_KEY_FALLBACKS
+    applies to it, and the data expires with PERMANENT_SESSION_LIFETIME.
+    """
+
+    salt = "server-session"
+    session_class = ServerSession
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def key(self, sid):
+        return "session:" + sid
+
+    def open_session(self, app, request):
+        signer = self.get_signing_serializer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self.session_class()
+        max_age = int(app.permanent_session_lifetime.total_seconds())
+        try:
+            sid = signer.loads(cookie, max_age=max_age)
+        except BadSignature:
+            return self.session_class()
+        data = self.backend.get(self.key(sid))
+        if data is None:
+            return self.session_class(sid=sid)
+        return self.session_class(self.serializer.loads(data), sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified:
+                if session.sid is not None:
+                    self.backend.delete(self.key(session.sid))
+                response.delete_cookie(
+                    name,
+                    domain=domain,
+                    path=path,
+                    secure=secure,
+                    partitioned=partitioned,
+                    samesite=samesite,
+                    httponly=httponly,
+                )
+                response.vary.add("Cookie")
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.backend.set(
+            self.key(session.sid),
+            self.serializer.dumps(dict(session)),
+            timeout=int(app.permanent_session_lifetime.total_seconds()),
+        )
+        response.set_cookie(
+            name,
+            self.get_signing_serializer(app).dumps(session.sid),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            partitioned=partitioned,
+            samesite=samesite,
+        )
+        response.vary.add("Cookie")
+
+
+def init_app(app):
+    """ Installs the server-side session store SESSION_BACKEND names, if any """
+    kind = app.config.get("SESSION_BACKEND")
+    if kind == "lru":
+        backend = LRUBackend(app.config.get("CACHE_MAX_ENTRIES", 1024))
+    elif kind == "socket":
+        backend = SocketBackend(app.config["SESSION_URL"])
+    elif kind:
+        raise ValueError("Unknown SESSION_BACKEND {!r}".format(kind))
+    else:
+        return
+    app.session_interface = ServerSessionInterface(backend)
@@ -0,0 +1,132 @@
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import DateTime, event, func, inspect, literal, select
+
+from models import db, Show, ArtistStats, VenueStats
+
+# For each kind: the statistics model, its key and the Show column it counts by
+STATS = {
+    "venues": (VenueStats, VenueStats.venue_id, Show.venue_id),
+    "artists": (ArtistStats, ArtistStats.artist_id, Show.artist_id),
+}
+COUNTERPARTS = {"venues": "artists", "artists": "venues"}
+# Ids per IN list when refreshing many entities
+REFRESH_BATCH_SIZE = 500
+
+
+def computed(column, now):
+    """ Returns a SELECT of the statistics rows of the shows grouped by column """
+    upcoming = Show.start_time >= now
+    return (
+        select(
+            column,
+            func.count(Show.id).filter(upcoming),
+            func.count(Show.id).filter(~upcoming),
+            func.min(Show.start_time).filter(upcoming),
+            func.max(Show.start_time).filter(~upcoming),
+            literal(now, DateTime),
+        )
+        .where(column.isnot(None))
+        .group_by(column)
+    )
+
+
+def store(session, kind, now, ids=None):
+    """ Replaces the statistics rows of ids (all of them if None) with rows
+    computed from the shows, in one DELETE and one INSERT ... SELECT"""
+    model, key, column = STATS[kind]
+    table = model.__table__
+    rows = computed(column, now)
+    delete = table.delete()
+    if ids is not None:
+        rows = rows.where(column.in_(ids))
+        delete = delete.where(key.in_(ids))
+    session.execute(delete)
+    session.execute(
+        table.insert().from_select(
+            [
+                key,
+                model.upcoming_shows_count,
+                model.past_shows_count,
+                model.next_show_time,
+                model.last_show_time,
+                model.refreshed_at,
+            ],
+            rows,
+        )
+    )
+
+
+def refresh(session, kind, ids, now=None):
+    """ Recomputes the statistics of the venues or artists in ids
+
+    Each is an index range scan of (venue_id or artist_id, start_time), so
+    the cost follows the shows of the entities touched, not the table size.
+    """
+    now = now or datetime.today()
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        store(session, kind, now, ids[start : start + REFRESH_BATCH_SIZE])
+
+
+def roll(session, now=None):
+    """ Refreshes the entities whose next show has started since their last
+    refresh, moving it from upcoming to past, and returns their ids by kind"""
+    now = now or datetime.today()
+    rolled = {}
+    for kind, (model, key, _) in STATS.items():
+        rolled[kind] = [
+            id
+            for (id,) in session.execute(select(key).where(model.next_show_time < now))
+        ]
+        refresh(session, kind, rolled[kind], now)
+    return rolled
+
+
+def rebuild(session, now=None):
+    """ Recomputes the statistics of every venue and artist from scratch """
+    now = now or datetime.today()
+    for kind in STATS:
+        store(session, kind, now)
+
+
+def counterparts(session, kind, id):
+    """ Returns the kind and ids of the entities sharing a show with a venue or
+    an artist, whose statistics change when it is deleted"""
+    other = COUNTERPARTS[kind]
+    query = select(STATS[other][2]).where(STATS[kind][2] == id).distinct()
+    return other, [other_id for (other_id,) in session.execute(query)]
+
+
+def touched(session):
+    return session.info.setdefault("stats", {kind: set() for kind in STATS})
+
+
+@event.listens_for(db.session, "after_flush")
+def track_shows(session, flush_context):
+    """ Records the venues and artists whose shows the flush changed, before
+    and after the change, so moving a show refreshes both sides"""
+    ids = touched(session)
+    for show in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(show, Show):
+            continue
+        state = inspect(show)
+        for kind, (_, _, column) in STATS.items():
+            history = state.attrs[column.key].history
+            ids[kind].update(id for id in history.sum() if id is not None)
+
+
+@event.listens_for(db.session, "before_commit")
+def refresh_touched(session):
+    """ Refreshes the statistics changed by the ORM in the committing
+    transaction. Bulk statements call refresh themselves."""
+    session.flush()
+    ids = session.info.pop("stats", None)
+    for kind, kind_ids in (ids or {}).items():
+        refresh(session, kind, kind_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def forget_touched(session):
+    session.info.pop("stats", None)
@@ -0,0 +1,39 @@
+import importlib.util
+import os
+
+import pytest
+
+os.environ["FAYIR_CONFIG"] = "testing"
+os.environ["DATABASE_URL"] = "sqlite://"
+
+from app import app as fayir  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """ The app over an empty in-memory database
+
+    No app context is kept pushed, so that every request gets a session of
+    its own as it would when served.
+    """
+    with fayir.app_context():
+        db.create_all()
+    yield fayir
+    with fayir.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def gunicorn_conf():
+    """ The gunicorn settings module, with its server hooks """
+    path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py")
+    spec = importlib.util.spec_from_file_location("gunicorn_conf", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import api
+from models import Artist, Show, Venue, db
+
+
+def test_calendar_streams_without_orjson(app, client, monkeypatch):
+    with app.app_context():
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        start = datetime(2031, 5, 1, 20)
+        for day in range(3):
+            db.session.add(
+                Show(
+                    venue_id=venue.id,
+                    artist_id=artist.id,
+                    start_time=start + timedelta(days=day),
+                )
+            )
+        db.session.commit()
+
+    monkeypatch.setattr(api, "orjson", None)
+    response = client.get("/api/v1/calendar?from=2031-05-01&to=2031-05-08")
+    assert response.status_code == 200
+    shows = response.get_json()["data"]
+    assert [show["start_time"] for show in shows] == [
+        "2031-05-01T20:00:00",
+        "2031-05-02T20:00:00",
+        "2031-05-03T20:00:00",
+    ]
+    assert shows[0]["venue_name"] == "Mohawk"
+
+
+def test_method_not_allowed_is_json_under_the_api(client):
+    response = client.get("/api/v1/shows/availability")
+    assert response.status_code == 405
+    assert set(response.get_json()) == {"error"}
+    assert "POST" in response.headers["Allow"]
+
+    response = client.post("/")
+    assert response.status_code == 405
+    assert response.mimetype == "text/html"
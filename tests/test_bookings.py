@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytest
+
+from models import Artist, Show, Venue, db
+
+
+@pytest.fixture
+def ids(app):
+    """ A venue and two artists, one of them playing it from 20:00 to 22:00 """
+    with app.app_context():
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        spoon = Artist(name="Spoon", genres=["Rock n Roll"])
+        wilco = Artist(name="Wilco", genres=["Rock n Roll"])
+        db.session.add_all([venue, spoon, wilco])
+        db.session.flush()
+        db.session.add(
+            Show(
+                venue_id=venue.id,
+                artist_id=spoon.id,
+                start_time=datetime(2031, 5, 1, 20),
+                end_time=datetime(2031, 5, 1, 22),
+            )
+        )
+        db.session.commit()
+        return {"venue_id": venue.id, "spoon_id": spoon.id, "wilco_id": wilco.id}
+
+
+def create_show(client, venue_id, artist_id, start_time, end_time=""):
+    return client.post(
+        "/shows/create",
+        data={
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "start_time": start_time,
+            "end_time": end_time,
+        },
+    )
+
+
+def show_times(app, artist_id):
+    with app.app_context():
+        return (
+            db.session.query(Show.start_time, Show.end_time)
+            .filter_by(artist_id=artist_id)
+            .all()
+        )
+
+
+def test_overlapping_show_at_the_venue_is_refused(app, client, ids):
+    response = create_show(
+        client, ids["venue_id"], ids["wilco_id"], "2031-05-01 21:00", "2031-05-01 23:00"
+    )
+    assert response.status_code == 409
+    assert b"The venue already has a show at that time." in response.data
+    assert show_times(app, ids["wilco_id"]) == []
+
+
+def test_back_to_back_shows_are_accepted(app, client, ids):
+    for start, end in [("22:00", "23:30"), ("18:00", "20:00")]:
+        response = create_show(
+            client,
+            ids["venue_id"],
+            ids["wilco_id"],
+            "2031-05-01 " + start,
+            "2031-05-01 " + end,
+        )
+        assert response.status_code == 200
+    assert sorted(show_times(app, ids["wilco_id"])) == [
+        (datetime(2031, 5, 1, 18), datetime(2031, 5, 1, 20)),
+        (datetime(2031, 5, 1, 22), datetime(2031, 5, 1, 23, 30)),
+    ]
+
+
+def test_show_without_end_time_lasts_the_default_duration(app, client, ids):
+    response = create_show(client, ids["venue_id"], ids["wilco_id"], "2031-05-02 20:00")
+    assert response.status_code == 200
+    assert show_times(app, ids["wilco_id"]) == [
+        (datetime(2031, 5, 2, 20), datetime(2031, 5, 2, 22))
+    ]
+    # The default end counts when checking the next show for an overlap
+    response = create_show(client, ids["venue_id"], ids["spoon_id"], "2031-05-02 21:59")
+    assert response.status_code == 409
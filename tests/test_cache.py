@@ -0,0 +1,135 @@
+import socketserver
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app import page_cache
+from cache import LRUBackend, PageCache
+from models import Venue, db
+
+EDIT = {
+    "name": "The Fillmore",
+    "city": "San Francisco",
+    "state": "CA",
+    "phone": "",
+    "address": "1805 Geary Blvd",
+    "genres": "Rock n Roll",
+    "facebook_link": "",
+    "website": "",
+    "image_link": "",
+    "seeking_description": "",
+}
+
+
+@pytest.fixture
+def replica(app, monkeypatch):
+    """ Adds a replica bind, which only has the primary's writes once caught
+    up, and turns the page cache on"""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    db.metadata.create_all(engine)
+    with app.app_context():
+        monkeypatch.setitem(db.engines, "replica1", engine)
+    monkeypatch.setitem(app.config, "SQLALCHEMY_BINDS", {"replica1": "sqlite://"})
+    monkeypatch.setattr(page_cache, "backend", LRUBackend())
+
+    def catch_up():
+        table = Venue.__table__
+        with app.app_context():
+            rows = db.session.execute(table.select()).mappings().all()
+        with engine.begin() as conn:
+            conn.execute(table.delete())
+            conn.execute(table.insert(), [dict(row) for row in rows])
+
+    yield catch_up
+    engine.dispose()
+
+
+def test_page_read_from_lagging_replica_is_not_cached(app, replica):
+    with app.app_context():
+        venue = Venue(name="Fillmore West", city="San Francisco", genres=[])
+        db.session.add(venue)
+        db.session.commit()
+        path = "/venues/{}".format(venue.id)
+    replica()
+    writer, reader = app.test_client(), app.test_client()
+    hits = page_cache.hits
+    assert b"Fillmore West" in reader.get(path).data
+    assert b"Fillmore West" in reader.get(path).data
+    assert page_cache.hits == hits + 1
+
+    writer.post(path + "/edit", data=EDIT)
+    # The replica has yet to replay the edit, the writer reads the primary
+    assert b"Fillmore West" in reader.get(path).data
+    assert b"The Fillmore" in writer.get(path).data
+
+    # No stale page was cached meanwhile
+    replica()
+    assert b"The Fillmore" in reader.get(path).data
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """ Serves GET, SET and DEL of a dict, as much of Redis as the cache uses """
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2])
+            command, key = args[0].upper(), args[1]
+            if command == b"GET":
+                value = self.server.data.get(key)
+                if value is None:
+                    reply = b"$-1\r\n"
+                else:
+                    reply = b"$%d\r\n%s\r\n" % (len(value), value)
+            elif command == b"SET":
+                self.server.data[key] = args[2]
+                reply = b"+OK\r\n"
+            else:
+                reply = b":%d\r\n" % (self.server.data.pop(key, None) is not None)
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def cache_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RESPHandler)
+    server.daemon_threads = True
+    server.data = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "redis://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def test_invalidation_reaches_other_processes(cache_url):
+    # Two workers, or a worker and a CLI command, each with its own cache
+    caches = []
+    for _ in range(2):
+        process = Flask(__name__)
+        process.config.update(CACHE_BACKEND="socket", CACHE_URL=cache_url)
+        caches.append((process, PageCache(process)))
+    (worker, worker_cache), (command, command_cache) = caches
+
+    with worker.app_context():
+        assert worker_cache.memoize("count", ["venues"], lambda: 1) == 1
+    with command.app_context():
+        assert command_cache.memoize("count", ["venues"], lambda: 2) == 1
+        command_cache.invalidate("venues")
+    with worker.app_context():
+        assert worker_cache.memoize("count", ["venues"], lambda: 3) == 3
+
+
+def test_gunicorn_refuses_lru_cache_with_workers(app, gunicorn_conf, monkeypatch):
+    monkeypatch.setitem(app.config, "CACHE_BACKEND", "lru")
+    single = SimpleNamespace(cfg=SimpleNamespace(workers=1))
+    gunicorn_conf.on_starting(single)
+    with pytest.raises(RuntimeError):
+        gunicorn_conf.on_starting(SimpleNamespace(cfg=SimpleNamespace(workers=4)))
@@ -0,0 +1,70 @@
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from models import Artist, PendingDelete, Show, Venue, db
+
+
+@pytest.fixture
+def venue_id(app, monkeypatch):
+    """ A venue with more shows than are deleted in one transaction """
+    monkeypatch.setitem(app.config, "DELETE_BATCH_THRESHOLD", 2)
+    monkeypatch.setitem(app.config, "DELETE_BATCH_SIZE", 2)
+    with app.app_context():
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        start = datetime(2031, 5, 1, 20)
+        for day in range(5):
+            db.session.add(
+                Show(
+                    venue_id=venue.id,
+                    artist_id=artist.id,
+                    start_time=start + timedelta(days=day),
+                )
+            )
+        db.session.commit()
+        return venue.id
+
+
+def remaining(app, venue_id):
+    with app.app_context():
+        return (
+            db.session.get(Venue, venue_id) is not None,
+            db.session.query(Show).filter_by(venue_id=venue_id).count(),
+            db.session.query(PendingDelete).count(),
+        )
+
+
+def test_background_delete_finishes(app, client, venue_id, monkeypatch):
+    threads = []
+
+    def start(**kwargs):
+        thread = threading.Thread(**kwargs)
+        threads.append(thread)
+        return thread
+
+    monkeypatch.setattr("app.threading", SimpleNamespace(Thread=start))
+    response = client.delete("/venues/{}".format(venue_id))
+    assert response.status_code == 202
+    assert response.get_json() == {"success": True, "pending": True}
+
+    (thread,) = threads
+    thread.join(timeout=10)
+    assert remaining(app, venue_id) == (False, 0, 0)
+
+
+def test_interrupted_delete_resumes_from_pending(app, client, venue_id, monkeypatch):
+    # The process stops before its background delete runs
+    stopped = SimpleNamespace(start=lambda: None)
+    monkeypatch.setattr("app.threading", SimpleNamespace(Thread=lambda **_: stopped))
+    assert client.delete("/venues/{}".format(venue_id)).status_code == 202
+    assert remaining(app, venue_id) == (True, 5, 1)
+
+    result = app.test_cli_runner().invoke(args=["delete", "--pending"])
+    assert result.exit_code == 0, result.output
+    assert result.output == "Deleted venue {} and its 5 shows\n".format(venue_id)
+    assert remaining(app, venue_id) == (False, 0, 0)
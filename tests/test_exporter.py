@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+
+from models import Artist, Show, Venue, db
+
+
+def export(app, *args):
+    result = app.test_cli_runner().invoke(args=["export", *args])
+    assert result.exit_code == 0, result.output
+    return result.stdout
+
+
+def test_exported_shows_import_back(app, tmp_path):
+    starts = [datetime(2031, 5, 1, 20), datetime(2031, 5, 2, 20, 30, 15, 250000)]
+    with app.app_context():
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        db.session.add_all([artist, venue])
+        db.session.flush()
+        for start in starts:
+            db.session.add(
+                Show(artist_id=artist.id, venue_id=venue.id, start_time=start)
+            )
+        db.session.commit()
+        exported = db.session.query(Show.start_time, Show.end_time).all()
+
+    source = tmp_path / "shows.csv"
+    source.write_text(export(app, "shows", "--format", "csv"))
+    with app.app_context():
+        db.session.query(Show).delete()
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["import", "shows", str(source)])
+    assert result.stdout.strip() == "Imported 2 shows, 0 errors", result.output
+    with app.app_context():
+        imported = db.session.query(Show.start_time, Show.end_time).all()
+    assert sorted(imported) == sorted(exported)
+
+
+def test_show_export_follows_artist_and_venue_changes(app, monkeypatch):
+    monkeypatch.setitem(app.config, "EXPORT_OVERLAP_SECONDS", 0)
+    with app.app_context():
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        db.session.add_all([artist, venue])
+        db.session.flush()
+        db.session.add(
+            Show(
+                artist_id=artist.id,
+                venue_id=venue.id,
+                start_time=datetime(2031, 5, 1, 20),
+            )
+        )
+        db.session.commit()
+        artist_id = artist.id
+        for model in (Artist, Venue, Show):
+            db.session.query(model).update({"updated_at": datetime(2020, 1, 1)})
+        db.session.commit()
+
+    since = ["--since", "2021-01-01"]
+    assert export(app, "shows", *since) == ""
+
+    with app.app_context():
+        db.session.get(Artist, artist_id).name = "Britt Daniel"
+        db.session.add(Venue(name="Parish", city="Austin", state="TX"))
+        db.session.commit()
+        renamed_at = db.session.get(Artist, artist_id).updated_at
+
+    (show,) = [json.loads(line) for line in export(app, "shows", *since).splitlines()]
+    assert show["artist_name"] == "Britt Daniel"
+    assert show["updated_at"] == renamed_at.isoformat(sep=" ")
+    venues = [json.loads(line) for line in export(app, "venues", *since).splitlines()]
+    assert [venue["name"] for venue in venues] == ["Parish"]
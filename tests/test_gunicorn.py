@@ -0,0 +1,17 @@
+from sqlalchemy import create_engine
+
+from models import db
+
+
+def test_post_fork_replaces_every_engine_pool(app, gunicorn_conf, monkeypatch):
+    replica = create_engine("sqlite://")
+    with app.app_context():
+        monkeypatch.setitem(db.engines, "replica1", replica)
+        engines = dict(db.engines)
+    pools = {bind: engine.pool for bind, engine in engines.items()}
+    assert set(pools) == {None, "replica1"}
+
+    gunicorn_conf.post_fork(server=None, worker=None)
+    # The connections inherited from the master are left to it, unused
+    assert all(engine.pool is not pools[bind] for bind, engine in engines.items())
+    replica.dispose()
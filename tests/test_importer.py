@@ -0,0 +1,106 @@
+import io
+import json
+
+from sqlalchemy import event
+
+from app import IMPORTERS
+from models import Artist, Show, Venue, db
+
+
+def venue_line(name, city="Austin"):
+    return json.dumps(
+        {
+            "name": name,
+            "city": city,
+            "state": "TX",
+            "address": "1 Red River St",
+            "genres": ["Jazz"],
+            "facebook_link": "https://www.facebook.com/venue",
+            "website": "https://venue.example.com",
+        }
+    )
+
+
+def test_import_inserts_each_batch_at_once(app):
+    source = io.StringIO("\n".join(venue_line("Venue {}".format(i)) for i in range(5)))
+    inserts = []
+
+    def count_inserts(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO "Venue"'):
+            inserts.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", count_inserts)
+        try:
+            reports = list(IMPORTERS["venues"].run(db.session, source, "jsonl", 2))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", count_inserts)
+        assert [report["inserted"] for report in reports] == [2, 2, 1]
+        assert len(inserts) == 3
+        assert db.session.query(Venue).count() == 5
+
+
+def test_import_resolves_references_by_id_or_name(app):
+    with app.app_context():
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        twins = [Venue(name="Parish", city=city, state="TX") for city in "AB"]
+        db.session.add_all([artist, venue, *twins])
+        db.session.commit()
+        rows = [
+            {"artist_id": artist.id, "venue_id": venue.id},
+            {"artist_name": "Spoon", "venue_name": "Mohawk"},
+            {"artist_name": "Spoon", "venue_id": 999},
+            {"artist_name": "Wilco", "venue_id": venue.id},
+            {"artist_id": artist.id, "venue_name": "Parish"},
+            {"venue_id": venue.id},
+        ]
+        source = io.StringIO(
+            "\n".join(
+                json.dumps(dict(row, start_time="2031-05-0{} 20:00".format(day)))
+                for day, row in enumerate(rows, 1)
+            )
+        )
+
+        (report,) = IMPORTERS["shows"].run(db.session, source, "jsonl", 100)
+        assert report["inserted"] == 2
+        assert [(error["line"], error["errors"]) for error in report["errors"]] == [
+            (3, {"venue_id": ["unknown id"]}),
+            (4, {"artist_id": ["unknown name"]}),
+            (5, {"venue_id": ["ambiguous name"]}),
+            (6, {"artist_id": ["missing artist_id or artist_name"]}),
+        ]
+        shows = db.session.query(Show.artist_id, Show.venue_id).all()
+        assert shows == [(artist.id, venue.id)] * 2
+
+
+def test_import_reports_errors_per_row(app, tmp_path):
+    with app.app_context():
+        artist = Artist(name="Spoon", genres=["Rock n Roll"])
+        venue = Venue(name="Mohawk", city="Austin", state="TX")
+        db.session.add_all([artist, venue])
+        db.session.commit()
+    source = tmp_path / "shows.csv"
+    source.write_text(
+        "artist_name,venue_name,start_time,end_time\n"
+        "Spoon,Mohawk,2031-05-01 20:00,2031-05-01 23:00\n"
+        "Spoon,Mohawk,,\n"
+        "Spoon,Mohawk,next friday,\n"
+        "Spoon,Mohawk,2031-05-02 20:00,2031-05-02 19:00\n"
+        "Spoon,Mohawk,2031-05-03 20:00,\n"
+    )
+
+    result = app.test_cli_runner().invoke(
+        args=["import", "shows", str(source), "--batch-size", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.stdout.strip() == "Imported 2 shows, 3 errors"
+    errors = [json.loads(line) for line in result.stderr.splitlines()]
+    assert [(error["batch"], error["line"]) for error in errors] == [
+        (1, 3),
+        (2, 4),
+        (2, 5),
+    ]
+    assert set(errors[0]["errors"]) == {"start_time"}
+    assert set(errors[1]["errors"]) == {"start_time"}
+    assert set(errors[2]["errors"]) == {"end_time"}
@@ -0,0 +1,27 @@
+import logging
+import queue
+import threading
+
+from logs import DroppingQueueHandler
+
+
+def test_dropped_records_are_all_counted():
+    handler = DroppingQueueHandler(queue.Queue(5))
+    record = logging.LogRecord("fayir", logging.ERROR, __file__, 1, "full", (), None)
+
+    def log():
+        for _ in range(500):
+            handler.emit(logging.makeLogRecord(record.__dict__))
+
+    threads = [threading.Thread(target=log) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.queue.qsize() == 5
+    assert handler.dropped == 8 * 500 - 5
+
+    handler.queue.get_nowait()
+    handler.emit(logging.makeLogRecord(record.__dict__))
+    assert handler.dropped == 0
+    assert handler.queue.queue[-1].dropped == 8 * 500 - 5
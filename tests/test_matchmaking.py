@@ -0,0 +1,102 @@
+import re
+
+import pytest
+
+import api
+from app import page_cache
+from cache import LRUBackend
+from matchmaking import recommend
+from models import Artist, Venue, db
+
+EDIT = {
+    "name": "Kamasi Washington",
+    "city": "Austin",
+    "state": "TX",
+    "phone": "",
+    "genres": "Jazz",
+    "facebook_link": "",
+    "website": "",
+    "image_link": "",
+    "seeking_venue": "y",
+    "seeking_description": "",
+}
+
+
+def seeking_artist(name, city, genres):
+    return Artist(name=name, city=city, state="TX", genres=genres, seeking_venue=True)
+
+
+@pytest.fixture
+def venue_id(app):
+    """ A jazz venue in Austin, among many artists of its city or its genre
+    that match it poorly, with a far better match listed after them all """
+    with app.app_context():
+        venue = Venue(name="Elephant Room", city="Austin", state="TX", genres=["Jazz"])
+        db.session.add(venue)
+        for i in range(30):
+            db.session.add(seeking_artist("a{}".format(i), "Austin", ["Punk"]))
+            db.session.add(seeking_artist("j{}".format(i), "Houston", ["Jazz"]))
+        db.session.add(seeking_artist("perfect", "Austin", ["Jazz"]))
+        db.session.commit()
+        return venue.id
+
+
+def test_best_match_is_found_past_the_candidate_limit(app, venue_id):
+    with app.app_context():
+        venue = db.session.get(Venue, venue_id)
+        matches = recommend("venues", venue, 3, 20)
+    assert matches[0]["name"] == "perfect"
+    assert matches[0]["score"] == 0.8
+
+
+def test_matches_are_invalidated_by_candidates_they_can_hold(
+    app, client, venue_id, monkeypatch
+):
+    monkeypatch.setattr(page_cache, "backend", LRUBackend())
+    computed = []
+
+    def counted(*args):
+        computed.append(args)
+        return recommend(*args)
+
+    monkeypatch.setattr(api, "recommend", counted)
+    path = "/api/v1/venues/{}/matches".format(venue_id)
+
+    def top_match():
+        return client.get(path).get_json()["data"][0]["name"]
+
+    assert top_match() == "perfect"
+    # An artist of another city and genre cannot be a candidate
+    client.post("/artists/create", data=dict(EDIT, city="Dallas", genres="Pop"))
+    assert top_match() == "perfect"
+    assert len(computed) == 1
+
+    with app.app_context():
+        perfect_id = db.session.query(Artist.id).filter_by(name="perfect").scalar()
+    client.post("/artists/{}/edit".format(perfect_id), data=EDIT)
+    assert top_match() == "Kamasi Washington"
+    assert len(computed) == 2
+
+
+def test_venue_form_keeps_seeking_talent(app, client):
+    client.post(
+        "/venues/create",
+        data={
+            "name": "Elephant Room",
+            "city": "Austin",
+            "state": "TX",
+            "phone": "",
+            "address": "315 Congress Ave",
+            "genres": "Jazz",
+            "facebook_link": "",
+            "website": "",
+            "image_link": "",
+            "seeking_talent": "y",
+            "seeking_description": "",
+        },
+    )
+    with app.app_context():
+        venue_id, seeking = db.session.query(Venue.id, Venue.seeking_talent).one()
+    assert seeking is True
+    page = client.get("/venues/{}/edit".format(venue_id)).get_data(as_text=True)
+    assert re.search(r'<input checked [^>]*id="seeking_talent"', page)
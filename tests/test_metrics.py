@@ -0,0 +1,35 @@
+import pytest
+
+from metrics import new_metrics
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/cache/stats"])
+def test_metrics_need_a_token_unless_public(app, client, monkeypatch, path):
+    assert client.get(path).status_code == 200
+    monkeypatch.setitem(app.config, "METRICS_PUBLIC", False)
+    assert client.get(path).status_code == 401
+
+    monkeypatch.setitem(app.config, "METRICS_TOKEN", "secret")
+    assert client.get(path).status_code == 401
+    headers = {"Authorization": "Bearer secret"}
+    assert client.get(path, headers=headers).status_code == 200
+
+
+def test_metrics_add_up_processes(app, client, monkeypatch, tmp_path):
+    metrics = app.extensions["request_metrics"]
+    requests, histograms = new_metrics()
+    monkeypatch.setattr(metrics, "requests", requests)
+    monkeypatch.setattr(metrics, "histograms", histograms)
+    monkeypatch.setattr(metrics, "directory", str(tmp_path))
+    monkeypatch.setattr(metrics, "process", None)
+    # /metrics writes this process's numbers itself, no need to wait for it
+    monkeypatch.setattr(metrics, "write_pending", True)
+    # What another worker wrote
+    (tmp_path / "1-other.json").write_text(
+        '{"fayir_requests_total": [[["/venues", "GET", 200], 41]]}'
+    )
+    client.get("/venues")
+    exposition = client.get("/metrics").get_data(as_text=True)
+    assert 'fayir_requests_total{route="/venues",method="GET",status="200"} 42' in (
+        exposition
+    )
@@ -0,0 +1,42 @@
+import re
+
+from models import Venue, db
+
+
+def page(client, query):
+    """ Returns the venue ids listed on a venues page, and its cursors """
+    html = client.get("/venues?limit=2" + query).get_data(as_text=True)
+    ids = [int(id) for id in re.findall(r'href="/venues/(\d+)"', html)]
+    cursors = {
+        name: re.search(r"[?&;]{}=([\w-]+)".format(name), html)
+        for name in ("after", "before")
+    }
+    return ids, {name: m and m.group(1) for name, m in cursors.items()}
+
+
+def test_venues_with_null_keys_span_pages(app, client):
+    with app.app_context():
+        venues = [
+            Venue(name="Elysium", city="Austin", state="TX"),
+            Venue(name="Mohawk", city=None, state="TX"),
+            Venue(name="Antone's", city=None, state="TX"),
+            Venue(name=None, city="Austin", state="TX"),
+            Venue(name="Fillmore", city="Denver", state=None),
+        ]
+        db.session.add_all(venues)
+        db.session.commit()
+        # '' < 'Austin', and a missing state sorts first
+        expected = [venues[i].id for i in (4, 2, 1, 3, 0)]
+
+    seen, cursors = page(client, "")
+    while cursors["after"]:
+        ids, cursors = page(client, "&after=" + cursors["after"])
+        seen += ids
+    assert seen == expected
+
+    # and back from the last page
+    back = ids
+    while cursors["before"]:
+        ids, cursors = page(client, "&before=" + cursors["before"])
+        back = ids + back
+    assert back == expected
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from profiler import Profiler, profile_name
+
+
+def test_recent_parses_the_names_profiles_are_saved_under(monkeypatch, tmp_path):
+    profiler = Profiler()
+    monkeypatch.setattr(profiler, "directory", str(tmp_path))
+    saved = [
+        ("GET", "/venues_by_city/12", 0.0124),
+        ("POST", "/shows/create", 0.007),
+        ("GET", "/", 0.001),
+    ]
+    for second, (method, path, elapsed) in enumerate(saved):
+        created = datetime(2026, 10, 18, 9, 30, second)
+        (tmp_path / profile_name(created, method, path, elapsed)).write_text("a 1\n")
+    # Not a profile, though in the same directory
+    (tmp_path / "notes_about_profiles.collapsed").write_text("a 1\n")
+
+    profiles = profiler.recent()
+    assert [(p["method"], p["slug"], p["duration"]) for p in profiles] == [
+        ("GET", "index", 1),
+        ("POST", "shows-create", 7),
+        ("GET", "venues-by-city-12", 12),
+    ]
+    assert profiles[0]["created"] == datetime(2026, 10, 18, 9, 30, 2)
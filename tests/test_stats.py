@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+
+import stats
+from models import Artist, ArtistStats, Show, Venue, VenueStats, db
+
+PAST = datetime(2020, 5, 1, 20)
+LATER = datetime(2031, 5, 1, 20)
+LATEST = datetime(2031, 6, 1, 20)
+
+
+@pytest.fixture
+def ids(app):
+    """ Two venues and two artists without shows """
+    with app.app_context():
+        venues = [Venue(name=name, city="Austin", state="TX") for name in "AB"]
+        artists = [Artist(name=name, genres=["Jazz"]) for name in "XY"]
+        db.session.add_all(venues + artists)
+        db.session.commit()
+        return [venue.id for venue in venues], [artist.id for artist in artists]
+
+
+def stored_counts(now):
+    """ Returns the (past, upcoming) counts of every venue and artist with
+    shows, by kind and id, as the statistics rows give them at now"""
+    return {
+        kind: {getattr(row, key): row.counts(now) for row in db.session.query(model)}
+        for kind, model, key in (
+            ("venues", VenueStats, "venue_id"),
+            ("artists", ArtistStats, "artist_id"),
+        )
+    }
+
+
+def counted(now):
+    """ Returns the same counts, computed from the shows """
+    result = {"venues": {}, "artists": {}}
+    for show in db.session.query(Show):
+        for kind, id in (("venues", show.venue_id), ("artists", show.artist_id)):
+            past, upcoming = result[kind].get(id, (0, 0))
+            if show.start_time < now:
+                result[kind][id] = (past + 1, upcoming)
+            else:
+                result[kind][id] = (past, upcoming + 1)
+    return result
+
+
+def test_counts_follow_show_changes(app, ids):
+    (a, b), (x, y) = ids
+    now = datetime.today()
+    with app.app_context():
+        shows = [
+            Show(venue_id=a, artist_id=x, start_time=PAST),
+            Show(venue_id=a, artist_id=x, start_time=LATER),
+            Show(venue_id=a, artist_id=y, start_time=LATEST),
+        ]
+        db.session.add_all(shows)
+        db.session.commit()
+        assert stored_counts(now) == counted(now)
+        assert stored_counts(now)["venues"] == {a: (1, 2)}
+
+        # Moving a show to another venue and artist refreshes both sides
+        shows[1].venue_id, shows[1].artist_id = b, y
+        db.session.commit()
+        assert stored_counts(now) == counted(now)
+        assert stored_counts(now)["venues"] == {a: (1, 1), b: (0, 1)}
+
+        db.session.delete(shows[0])
+        db.session.commit()
+        assert stored_counts(now) == counted(now)
+        # No row is left for an entity without shows
+        assert stored_counts(now)["artists"] == {y: (0, 2)}
+
+
+def test_roll_moves_started_shows_to_the_past(app, ids):
+    (a, b), (x, y) = ids
+    with app.app_context():
+        db.session.add_all(
+            [
+                Show(venue_id=a, artist_id=x, start_time=LATER),
+                Show(venue_id=a, artist_id=x, start_time=LATEST),
+                Show(venue_id=b, artist_id=y, start_time=LATEST),
+            ]
+        )
+        db.session.commit()
+
+        # Past the next show of a and x, their rows wait for the next roll
+        now = datetime(2031, 5, 15)
+        assert db.session.get(VenueStats, a).counts(now) is None
+        assert db.session.get(ArtistStats, x).counts(now) is None
+        assert db.session.get(VenueStats, b).counts(now) == (0, 1)
+
+        assert stats.roll(db.session, now) == {"venues": [a], "artists": [x]}
+        db.session.commit()
+        assert stored_counts(now) == counted(now)
+        assert db.session.get(VenueStats, a).counts(now) == (1, 1)
+        assert stats.roll(db.session, now) == {"venues": [], "artists": []}
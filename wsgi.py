@@ -0,0 +1,12 @@
+""" Production entry point
+
+    $ gunicorn -c gunicorn.conf.py wsgi:application
+
+The production profile is used unless FAYIR_CONFIG names another one.
+"""
+
+import os
+
+os.environ.setdefault("FAYIR_CONFIG", "production")
+
+from app import app as application  # noqa: E402